@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""Headless render benchmark of display.py.
+
+Runs the real render functions of display.py (display_stuff, on_push_state
+including the albumart processing, sendtodisplay) against the headless
+simulator, without volumio and without a display server. Reports p50/p95/p99
+per stage and writes them as json, so regressions show up between releases.
+
+    python3 benchmark.py --output bench.json
+    python3 benchmark.py --trace states.jsonl  # replay recorded websocket events
+    python3 benchmark.py --volumio localhost:3000  # button to frame latency against fakevolumio.py serve
+"""
+
+import os
+import sys
+import json
+import argparse
+import platform
+import subprocess
+from math import ceil
+from threading import Thread
+from queue import Queue, Empty
+from time import perf_counter, strftime, monotonic, sleep
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+os.environ.setdefault('PIRATEAUDIO_DISPLAY', 'headless')  # simulator without window
+
+import PIL
+
+import display
+from fakevolumio import synthetic_art
+
+ART_SIZES = [300, 600, 1000, 1500, 3000]
+ART_QUALITIES = ['speed', 'quality']
+ART_BLURS = ['pil', 'box', 'stack', 'none']
+TIMINGS = {}  # stage -> list of seconds
+
+
+def timed(stage, function):
+    """wraps a function of display.py, so every call of it gets timed as stage"""
+    def wrapper(*args, **kwargs):
+        start_time = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            TIMINGS.setdefault(stage, []).append(perf_counter() - start_time)
+    return wrapper
+
+
+def instrument():
+    """times the render stages, display.py looks its functions up at call time"""
+    for stage in ['display_stuff', 'on_push_state', 'art_process', 'sendtodisplay']:
+        setattr(display, stage, timed(stage, getattr(display, stage)))
+
+
+class ArtHandler(BaseHTTPRequestHandler):
+    """serves /art/<size>.jpg like the albumart endpoint of volumio"""
+    ART = {}
+
+    def do_GET(self):
+        try:
+            size = int(self.path.split('/')[-1].split('.')[0])
+        except ValueError:
+            self.send_error(404)
+            return
+        if size not in self.ART:
+            self.ART[size] = synthetic_art(size)
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(self.ART[size])))
+        self.end_headers()
+        self.wfile.write(self.ART[size])
+
+    def log_message(self, *args):
+        pass
+
+
+def art_server():
+    """starts the albumart server in a thread, returns its base url"""
+    server = HTTPServer(('127.0.0.1', 0), ArtHandler)
+    thread = Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return 'http://127.0.0.1:%d' % server.server_address[1]
+
+
+def state(albumart, title='Title', seek=0, volume=50, status='play'):
+    """pushstate like volumio sends it"""
+    return {
+        "status": status, "title": title, "artist": 'Artist', "album": 'Album',
+        "albumart": albumart, "volume": volume, "seek": seek, "duration": 300,
+        "service": 'mpd', "position": 0
+    }
+
+
+def reset_player():
+    """forget everything that would let on_push_state skip work"""
+    with display.ARTCACHE_DICT['LOCK']:
+        display.ARTCACHE_DICT['ENTRIES'].clear()
+        display.ARTCACHE_DICT['BYTES'] = 0
+    display.VOLUMIO_DICT['ALBUMART'] = ''
+    display.VOLUMIO_DICT['STATE_LAST'] = None
+
+
+def art_modes(value):
+    """parses --art-modes, 'all' or comma separated quality:blur pairs, empty list keeps config.json"""
+    if not value:
+        return []
+    if value == 'all':
+        return [(quality, blur) for quality in ART_QUALITIES for blur in ART_BLURS]
+    return [tuple(mode.split(':')) for mode in value.split(',')]
+
+
+def bench_art(base, iterations, modes):
+    """cold track changes: fetch, decode, resize and blur of covers from 300 to 3000 px, per decode mode"""
+    display.reset_variable('player')
+    for mode in modes or [None]:
+        suffix = ''
+        if mode is not None:
+            display.ARTDECODE_DICT['QUALITY'], display.ARTDECODE_DICT['BLUR'] = mode
+            suffix = '_%s_%s' % mode
+        for size in ART_SIZES:
+            stage = 'on_push_state_art_%d%s' % (size, suffix)
+            for i in range(iterations):
+                reset_player()
+                start_time = perf_counter()
+                display.on_push_state(state(''.join([base, '/art/', str(size), '.jpg']), title='Title %d' % i))
+                TIMINGS.setdefault(stage, []).append(perf_counter() - start_time)
+
+
+def bench_state(base, iterations):
+    """warm pushstates of a playing track: only volume and seek change"""
+    display.reset_variable('player')
+    albumart = ''.join([base, '/art/600.jpg'])
+    for i in range(iterations):
+        display.on_push_state(state(albumart, seek=i * 1000, volume=i % 100))
+
+
+def bench_titles(base, iterations):
+    """track changes with cached art, but long titles"""
+    display.reset_variable('player')
+    albumart = ''.join([base, '/art/600.jpg'])
+    for i in range(iterations):
+        display.on_push_state(state(albumart, title=' '.join(['A very long title of track number', str(i), 'that never fits'] * 3)))
+
+
+def bench_menu(iterations, length=500):
+    """holding Y through a long browse list with long entries"""
+    display.reset_variable('navigation')
+    names = ['Entry %d of a long browse list with long names' % i for i in range(length)]
+    display.NAV_DICT['LISTRESULT'] = length
+    for i in range(iterations):
+        marker = i % length
+        start = (marker // display.NAV_DICT['LISTMAX']) * display.NAV_DICT['LISTMAX']
+        display.display_stuff(display.IMAGE_DICT['BG_DEFAULT'], names, marker, start)
+
+
+def bench_trace(filename):
+    """replays recorded websocket events, one json object {"event": ..., "data": ...} per line"""
+    handlers = {
+        'pushState': display.on_push_state,
+        'pushQueue': display.on_push_queue,
+        'pushBrowseSources': display.on_push_browsesources,
+        'pushBrowseLibrary': display.on_push_browselibrary
+    }
+    with open(filename, 'r') as mytracefile:
+        for line in mytracefile:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record['event'] in handlers:
+                if record['event'] == 'pushBrowseLibrary':  # answer to a browse emit, uri None: shown, not cached
+                    display.BROWSE_DICT['PENDING'] = (0, None, 0, 0)
+                start_time = perf_counter()
+                handlers[record['event']](record['data'])
+                TIMINGS.setdefault(''.join(['trace_', record['event']]), []).append(perf_counter() - start_time)
+
+
+def press(frames, stage, channel, hold=0.05, timeout=2.0):
+    """presses a simulated button, times until the first frame that changes pixels"""
+    while not frames.empty():
+        frames.get()
+    start = monotonic()
+    display.GPIO.play([(0, channel, hold)])
+    while True:
+        try:
+            entry = frames.get(timeout=max(start + timeout - monotonic(), 0))
+        except Empty:
+            TIMINGS.setdefault(stage + '_timeout', []).append(timeout)
+            break
+        if entry['pixels'] > 0:
+            TIMINGS.setdefault(stage, []).append(entry['t'] - start)
+            break
+    sleep(hold + 0.3)  # let repeats, pushstates and renders settle
+
+
+def bench_latency(volumio, iterations):
+    """button to frame latency of volume, scrolling and menu navigation, with the render worker and the
+    repeat scheduler running and the websocket connected to volumio (fakevolumio.py serve)"""
+    host, port = volumio.rsplit(':', 1)
+    display.reset_variable('player')
+    display.connect(host, int(port))
+    waiter = Thread(target=display.SOCKETIO.wait)
+    waiter.daemon = True
+    waiter.start()
+    display.RENDER_DICT['THREAD'] = display.THREAD3
+    display.THREAD3.start()
+    display.THREAD4.start()
+    frames = Queue()
+    display.DISP.listeners.append(frames.put)
+    sleep(1)  # first state and queue
+    for i in range(iterations):
+        press(frames, 'latency_volume', display.BUTTONS[3] if i % 2 == 0 else 6)  # up and down, stays within 0-100
+    for i in range(max(iterations // 5, 3)):
+        press(frames, 'latency_menu_open', 16)
+        for j in range(3):
+            press(frames, 'latency_scroll', display.BUTTONS[3])
+        press(frames, 'latency_menu_close', 6)
+
+
+def bench_startup(runs):
+    """cold start of display.py until the first frame, in a new interpreter per run"""
+    code = 'import json, display; display.startup(); print(json.dumps(display.startup_log()))'
+    for i in range(runs):
+        start_time = perf_counter()
+        output = subprocess.check_output([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)), env=dict(os.environ, PIRATEAUDIO_DISPLAY='headless'))
+        TIMINGS.setdefault('startup_process', []).append(perf_counter() - start_time)
+        steps = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+        for step, ms in steps.items():
+            TIMINGS.setdefault(''.join(['startup_', step]), []).append(ms / 1000.0)
+
+
+def percentile(values, p):
+    """nearest-rank percentile of sorted values"""
+    if not values:
+        return 0
+    return values[max(int(ceil(p / 100.0 * len(values))) - 1, 0)]
+
+
+def report():
+    """p50/p95/p99 per stage in ms"""
+    result = {}
+    for stage, values in sorted(TIMINGS.items()):
+        values = sorted(values)
+        result[stage] = {
+            "count": len(values),
+            "p50": round(percentile(values, 50) * 1000, 3),
+            "p95": round(percentile(values, 95) * 1000, 3),
+            "p99": round(percentile(values, 99) * 1000, 3),
+            "max": round(values[-1] * 1000, 3)
+        }
+    return result
+
+
+def frame_report(log):
+    """bytes sent and changed pixels per frame of the headless display"""
+    result = {"count": len(log)}
+    for key in ['bytes', 'pixels']:
+        values = sorted(entry[key] for entry in log)
+        result[key] = {"p50": percentile(values, 50), "p95": percentile(values, 95), "max": values[-1] if values else 0}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='headless render benchmark of display.py')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--trace', help='jsonl file with recorded websocket events to replay')
+    parser.add_argument('--output', help='write results as json to this file')
+    parser.add_argument('--volumio', help='host:port of fakevolumio.py serve, measures button to frame latency')
+    parser.add_argument('--art-modes', help="albumart decode modes to compare, 'all' or e.g. 'speed:box,quality:pil', default config.json")
+    args = parser.parse_args()
+
+    display.ARTCACHE_DICT['PATH'] = None  # measure without the on-disk tier of previous runs
+    display.ARTFETCH_DICT['WAIT'] = None  # on_push_state waits for the albumart, to measure the whole pipeline
+    instrument()
+    base = art_server()
+    bench_startup(max(args.iterations // 10, 3))
+    if args.trace:
+        bench_trace(args.trace)
+    else:
+        bench_art(base, max(args.iterations // 5, 3), art_modes(args.art_modes))
+        bench_state(base, args.iterations)
+        bench_titles(base, args.iterations)
+        bench_menu(args.iterations * 4)
+    if args.volumio:  # last, from here on the render worker renders
+        bench_latency(args.volumio, args.iterations)
+
+    result = {
+        "date": strftime('%Y-%m-%dT%H:%M:%S'),
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "machine": platform.machine(),
+        "stages": report(),
+        "textcache": {"hits": display.TEXT_DICT['HITS'], "misses": display.TEXT_DICT['MISSES']},
+        "bytes_sent": getattr(display.DISP, 'bytes_sent', None),
+        "frames": frame_report(getattr(display.DISP, 'log', [])),
+        "render": dict((k, display.RENDER_DICT[k]) for k in ['SUBMITTED', 'RENDERED', 'COALESCED', 'DROPPED'])
+    }
+    print('%-36s %7s %9s %9s %9s %9s' % ('stage (ms)', 'count', 'p50', 'p95', 'p99', 'max'))
+    for stage, values in result['stages'].items():
+        print('%-36s %7d %9.3f %9.3f %9.3f %9.3f' % (stage, values['count'], values['p50'], values['p95'], values['p99'], values['max']))
+    if args.output:
+        with open(args.output, 'w') as myoutputfile:
+            json.dump(result, myoutputfile, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
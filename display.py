@@ -2,27 +2,43 @@
 
 SIMULATOR = True
 
+# first statement, startup timing: (step, monotonic end of step) until the first frame, see startup_log()
+from time import monotonic
+STARTUP = [('start', monotonic())]
+
 import os
 import os.path
 from io import BytesIO
 import sys
 import signal
+import locale
+import unicodedata
 from math import ceil, floor
 import json
+from collections import OrderedDict, deque
+from hashlib import sha1
 from time import strftime, gmtime, sleep, time  # v.0.0.7
-from threading import Thread
+from threading import Thread, Lock, RLock, Event, Condition, current_thread, local
+from functools import partial
+from itertools import accumulate
+from array import array
 from PIL import ImageFont, Image, ImageDraw, ImageStat, ImageFilter
-if SIMULATOR:
-    from simulator import ST7789  # simulator
-else:
-    import ST7789  # v0.0.6
-from socketIO_client import SocketIO
-import requests
-from numpy import mean
-if SIMULATOR:
-    pass #TODO: add GPIO simulator
+from framebuffer import Framebuffer
+import playqueue
+# display: st7789 (pirate audio), simulator (pygame window) or headless (frames in memory, no display server needed)
+DISPLAY_BACKEND = os.environ.get('PIRATEAUDIO_DISPLAY', 'simulator' if SIMULATOR else 'st7789')
+if DISPLAY_BACKEND == 'st7789':
+    from ST7789 import ST7789  # v0.0.6
+elif DISPLAY_BACKEND == 'headless':
+    from simulator import Headless as ST7789
 else:
+    from simulator import ST7789  # simulator
+if DISPLAY_BACKEND == 'st7789':
     import RPi.GPIO as GPIO
+else:
+    from simulator import GPIO  # buttons get pressed by scripts, see simulator.GPIOSimulator
+# requests and socketIO_client are imported when first used, after the first frame
+STARTUP.append(('imports', monotonic()))
 
 # import logging
 # logging.getLogger('socketIO-client').setLevel(logging.DEBUG)
@@ -34,11 +50,13 @@ SCRIPT_PATH = os.path.dirname(os.path.abspath(__file__))
 os.chdir(SCRIPT_PATH)
 
 
+ROTATION = 90  # Needed to display the right way up on Pirate Audio
+
 # Create ST7789 LCD Display class.
-DISP = ST7789.ST7789(
+DISP = ST7789(
     height=240,  # v0.0.6
     width=240,  # v0.0.6
-    rotation=90,  # Needed to display the right way up on Pirate Audio
+    rotation=ROTATION,
     port=0,       # SPI port
     cs=1,         # SPI port Chip-select channel
     dc=9,         # BCM pin used for data/command
@@ -47,44 +65,108 @@ DISP = ST7789.ST7789(
     offset_left=0,  # v0.0.6
     offset_top=0  # v0.0.6
 )
+STARTUP.append(('display', monotonic()))
 
 
 # read json file (plugin values)
-with open('/data/configuration/system_hardware/pirateaudio/config.json', 'r') as myfile:
-    DATA = myfile.read()
-OBJ = json.loads(DATA)
+CONFIGPATH = '/data/configuration/system_hardware/pirateaudio/config.json'
+if os.path.exists(CONFIGPATH) is False:  # not installed as plugin (simulator, benchmark), use defaults of plugin
+    CONFIGPATH = ''.join([SCRIPT_PATH, '/config.json'])
+
+
+def config_read():
+    """plugin values of config.json"""
+    with open(CONFIGPATH, 'r') as myfile:
+        return json.loads(myfile.read())
+
+
+OBJ = config_read()
+
+
+def get_config(key, default):
+    """returns plugin config value, default if key is missing (config.json of older versions)"""
+    if key in OBJ and 'value' in OBJ[key]:
+        return OBJ[key]['value']
+    return default
 
 # read json file (volumio language)
-with open('/data/configuration/miscellanea/appearance/config.json', 'r') as mylangfile:
-    DATA_LANG = mylangfile.read()
-OBJ_LANG = json.loads(DATA_LANG)
-LANGCODE = OBJ_LANG['language_code']['value']
-LANGPATH = ''.join(['/data/plugins/system_hardware/pirateaudio/i18n/strings_', LANGCODE, '.json'])  # v0.0.7
+LANGCODE = 'en'
+if os.path.exists('/data/configuration/miscellanea/appearance/config.json'):
+    with open('/data/configuration/miscellanea/appearance/config.json', 'r') as mylangfile:
+        DATA_LANG = mylangfile.read()
+    OBJ_LANG = json.loads(DATA_LANG)
+    LANGCODE = OBJ_LANG['language_code']['value']
+LANGPATH = ''.join([SCRIPT_PATH, '/i18n/strings_', LANGCODE, '.json'])  # v0.0.7
 if os.path.exists(LANGPATH) is False:  # fallback to en as default language
-    LANGPATH = '/data/plugins/system_hardware/pirateaudio/i18n/strings_en.json'
+    LANGPATH = ''.join([SCRIPT_PATH, '/i18n/strings_en.json'])
 
 # read json file (language file for translation)
 with open(LANGPATH, 'r') as mytransfile:
     DATA_TRANS = mytransfile.read()
 OBJ_TRANS = json.loads(DATA_TRANS)
+STARTUP.append(('config', monotonic()))
 
-TITLE_QUEUE, LEN_QUEUE = [], 0  # v.0.0.4
 NAV_ARRAY_NAME, NAV_ARRAY_URI, NAV_ARRAY_TYPE, NAV_ARRAY_SERVICE = [], [], [], []
-FONT_DICT = {
-    "FONT_S": ImageFont.truetype(''.join([SCRIPT_PATH, '/fonts/Roboto-Medium.ttf']), 20),
-    "FONT_M": ImageFont.truetype(''.join([SCRIPT_PATH, '/fonts/Roboto-Medium.ttf']), 24),
-    "FONT_L": ImageFont.truetype(''.join([SCRIPT_PATH, '/fonts/Roboto-Medium.ttf']), 30),
-    "FONT_FAS": ImageFont.truetype(''.join([SCRIPT_PATH, '/fonts/FontAwesome5-Free-Solid.otf']), 28)
-}
+
+
+class FontDict(dict):
+    """fonts get loaded on first use, the first frame needs only one of them"""
+    FILES = {
+        "FONT_S": ('/fonts/Roboto-Medium.ttf', 20),
+        "FONT_M": ('/fonts/Roboto-Medium.ttf', 24),
+        "FONT_L": ('/fonts/Roboto-Medium.ttf', 30),
+        "FONT_FAS": ('/fonts/FontAwesome5-Free-Solid.otf', 28)
+    }
+
+    def __missing__(self, key):
+        filename, size = self.FILES[key]
+        self[key] = ImageFont.truetype(''.join([SCRIPT_PATH, filename]), size)
+        return self[key]
+
+
+FONT_DICT = FontDict()
+
+
+class TextColumn(object):
+    """strings of a browse list joined into one str with offsets, works like a read-only list,
+    indexing and slicing create only the requested strings (the visible page)"""
+    __slots__ = ('data', 'offsets')
+
+    def __init__(self, strings):
+        self.data = ''.join(strings)
+        self.offsets = array('I', accumulate([0] + [len(string) for string in strings]))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('TextColumn index out of range')
+        return self.data[self.offsets[index]:self.offsets[index + 1]]
+
+    def nbytes(self):
+        """memory of the column"""
+        return sys.getsizeof(self.data) + sys.getsizeof(self.offsets)
+
+
+BG_DEFAULT = Image.open('images/default.jpg').resize((240, 240))  # opened once, shared, draw only on copies
 IMAGE_DICT = {
     "WIDTH": 240,
     "HEIGHT": 240,
-    "BG_DEFAULT": Image.open('images/default.jpg').resize((240, 240)),
-    "IMG": Image.open('images/default.jpg').resize((240, 240)),
-    "IMG2": Image.open('images/default.jpg').resize((240, 240)),
+    "BG_DEFAULT": BG_DEFAULT,
+    "IMG": BG_DEFAULT,
+    "IMG2": BG_DEFAULT,
     "IMG3": '',
-    "IMG_CHECK": '',
-    "LASTREFRESH": 0
+    "LASTREFRESH": 0,
+    "LOCK": RLock(),  # display gets refreshed from websocket and clock thread
+    "FRAMEBUFFER": Framebuffer(240, 240, ROTATION, 16),  # frame on the display as rgb565, changed rectangles are searched in bands of 16 rows
+    "PARTIAL": None,
+    "DIRTY_MAX": 0.5,  # send full frame if more than this part of the frame changed
+    "BACKLIGHT": True  # see backlight()
 }
 VOLUMIO_DICT = {
     "ALBUMART": '',
@@ -95,12 +177,16 @@ VOLUMIO_DICT = {
     "SEEK": 0,
     "VOLUME": 0,
     "DURATION": 0,
+    "TIMEBAR": False,
+    "ARTIST": None,
+    "ALBUM": None,
+    "TITLE": None,
     #"STATE_LAST": ''
     "STATE_LAST": None
 }
 NAV_DICT = {
     "MARKER": 0,
-    "LISTMAX": int(OBJ['listmax']['value']),
+    "LISTMAX": None,
     "LISTSTART": 0,
     "LISTRESULT": 0
 }
@@ -111,10 +197,265 @@ OVERLAY_DICT = {
     "BAR_COL": (255, 255, 255),
     "DARK": False
 }
+PALETTE_DICT = {  # overlay colors, chosen by the brightness of the background
+    "LIGHT": dict(OVERLAY_DICT),
+    "DARK": {
+        "TXT_COL": (55, 55, 55),
+        "STR_COL": (200, 200, 200),  # v0.0.4 needed for shadow
+        "BAR_BGCOL": (255, 255, 255),
+        "BAR_COL": (100, 100, 100),
+        "DARK": True
+    },
+    "DIM": dict(OVERLAY_DICT, TXT_COL=(200, 200, 200))
+}
+ICON_DICT = {
+    "GLYPHS": {  # Fontawesome symbols used by the plugin
+        "OK": u"\uf14a",
+        "UP": u"\uf151",
+        "DOWN": u"\uf150",
+        "BACK": u"\uf0e2",
+        "INFO": u"\uf05a",
+        "FORWARD": u"\uf04e",
+        "BACKWARD": u"\uf04a",
+        "PLAY": u"\uf04b",
+        "PAUSE": u"\uf04C",
+        "MENU": u"\uf0c9",
+        "VOLUME": u"\uf028"
+    },
+    "SPRITES": {},  # (name, color) -> (tinted image, alpha mask), built by icon_atlas()
+    "LAYOUTS": {  # symbols of display_stuff screens
+        "nav": [(0, 50, 'OK'), (210, 50, 'UP'), (0, 170, 'BACK'), (210, 170, 'DOWN')],
+        "info": [(10, 10, 'INFO')],
+        "seek": [(210, 50, 'FORWARD'), (0, 170, 'BACK'), (210, 170, 'BACKWARD')]
+    }
+}
+PAGE_DICT = {
+    "ENTRIES": OrderedDict(),  # rendered pages of display_stuff without marker, oldest first
+    "MAX_ENTRIES": 16,
+    "PAGE": None,  # page currently in IMG3
+    "MARKED": None
+}
+TEXT_DICT = {
+    "ENTRIES": OrderedDict(),  # (text, font path, font size) -> [size, alpha mask or None], oldest first
+    "MAX_ENTRIES": None,
+    "HITS": 0,
+    "MISSES": 0,
+    "LOCK": Lock()
+}
+CLOCK_DICT = {
+    "SEEK": 0,  # ms, seek of the last pushstate
+    "ANCHOR": 0,  # monotonic time of the last pushstate
+    "PLAYING": False,
+    "RATE": None,  # refreshs per second of timebar and remaining time
+    "RESYNC": None,  # seconds without pushstate until getState is emitted, 0 disables
+    "TOLERANCE": 2000,  # ms the clock may run past the end of the track or differ from a pushstate before getState is emitted
+    "DRIFT": 0  # ms between clock and last pushstate, a pushstate with a stale seek (e.g. after a volume change) gets confirmed
+}
+LAYER_DICT = {
+    "BASE": None,  # background and icons of the player screen, without text, marquees are repainted on it
+    "STATIC": None,  # player screen without volume and time: background, artist, album, title, icons
+    "STATIC_KEY": None,
+    "STATIC_BG": None,
+    "FRAME": None,  # static layer with the dynamic layers pasted on top, sent to display
+    "VOLUME_BOX": (0, 184, 240, 193),  # dynamic layers, restored from the static layer before painting
+    "VOLUME_KEY": None,
+    "TIME_BOX": (0, 200, 240, 240),
+    "TIME_KEY": None,
+    "MARQUEES": []  # artist, album or title wider than the display
+}
+MARQUEE_DICT = {  # scrolling of texts wider than the display, see marquee_frame()
+    "FPS": None,  # frames per second of the scrolling, 0 disables it
+    "SPEED": None,  # pixels per second
+    "PAUSE": None,  # seconds the text stands still at the start of each round
+    "GAP": 40,  # pixels between the end of the text and its next round
+    "ACTIVE": [],  # marquees of the screen shown, replaced as a whole
+    "STRIPS": OrderedDict(),  # (text, font path, font size) -> (mask with the text twice, pixels per round), oldest first
+    "MAX_STRIPS": 8,
+    "EVENT": Event()  # set when ACTIVE got marquees
+}
+ARTCACHE_DICT = {
+    "PATH": '/data/pirateaudio/artcache',  # on-disk tier, survives service restarts
+    "ENTRIES": OrderedDict(),  # in-memory tier, normalized url -> (image, palette, bytes), oldest first
+    "BYTES": 0,
+    "MAX_ENTRIES": None,
+    "MAX_BYTES": None,
+    "DISK_MAX_ENTRIES": None,
+    "DISK_MAX_BYTES": None,
+    "INFLIGHT": {},  # normalized url -> Event, set when processing of url is finished
+    "LOCK": Lock()
+}
+ARTDECODE_DICT = {
+    "QUALITY": None,  # key of MODES
+    "MODES": {  # quality -> (minimum jpeg draft size in multiples of the display, resize filter)
+        "speed": (1, Image.BILINEAR),
+        "quality": (2, Image.LANCZOS)
+    },
+    "BLUR": None,  # pil, box, stack or none, see art_blur()
+    "RADIUS": None
+}
+ARTFETCH_DICT = {
+    "SESSION": None,  # keep-alive connections to the albumart server, see art_session()
+    "CONNECT_TIMEOUT": None,  # seconds
+    "READ_TIMEOUT": None,  # seconds without data
+    "MAX_BYTES": None,
+    "WAIT": None,  # seconds on_push_state waits for albumart, then default background, None waits forever
+    "REVALIDATE": None,  # seconds until cached albumart with etag/last-modified gets checked again, 0 never
+    "CURRENT": None  # normalized url of the albumart of the current track
+}
+PREFETCH_DICT = {
+    "COUNT": None,  # upcoming queue entries to warm the albumart cache for
+    "URLS": [],  # normalized urls in prefetch order
+    "EVENT": Event()  # set when URLS got reordered
+}
+QUEUE_DICT = {  # play queue of volumio, kept up to date by on_push_queue()
+    "TRACKS": [],  # (name, artist, albumart url) per entry, replaced as a whole, never changed in place
+    "FINGERPRINTS": array('q'),  # hash of the volumio fields per entry, unchanged entries are kept on pushQueue
+    "REUSED": 0,  # entries kept by the last pushQueue
+    "PARSED": 0  # entries built from the payload by the last pushQueue
+}
+RENDER_DICT = {
+    "PENDING": None,  # latest render request (function, args, mode, generation), older requests get replaced
+    "BUSY": False,
+    "COND": Condition(),
+    "THREAD": None,  # render worker, None renders inline on the calling thread (benchmark, startup)
+    "GENERATION": 0,  # counted up by reset_variable, requests of an older generation are stale
+    "SUBMITTED": 0,
+    "RENDERED": 0,
+    "COALESCED": 0,  # requests replaced by a newer one before the worker picked them up
+    "DROPPED": 0  # requests picked up, but stale because mode or browse list changed meanwhile
+}
+
+AIO_DICT = {  # asyncio runtime, see aio_run()
+    "LOOP": None,
+    "EXECUTOR": None,  # single worker, runs the handlers of the thread runtime in order
+    "SESSION": None,  # aiohttp session for albumart
+    "INFLIGHT": {},  # normalized url -> future of aio_fetch()
+    "FAILED": {},  # normalized url -> monotonic time its fetch failed, shown as default background until RETRY passed
+    "RETRY": None,  # seconds
+    "STATE_SEQ": 0  # counts pushstates, states overtaken while fetching albumart are skipped
+}
+BROWSE_DICT = {  # browse results by uri, see browse_open()
+    "ENTRIES": OrderedDict(),  # uri -> (monotonic time, names, uris, types, services, bytes), oldest first, '' are the browse sources
+    "BYTES": 0,
+    "MAX_ENTRIES": None,
+    "MAX_BYTES": None,
+    "TTL": None,  # seconds until an entry is fetched again
+    "UPDATEDB": False,  # volumio rescans the library, entries are dropped when the rescan is finished
+    "HISTORY": [],  # (uri, marker, liststart) of the parent levels, last is the level shown before the current one
+    "CURRENT": None,  # uri of the level shown, None if unknown (not cached, no way back to it)
+    "PENDING": None,  # (seq, uri, marker, liststart) of the latest browse emit, None if no answer is awaited
+    "SEQ": 0,  # counts browse emits
+    "ORPHANS": OrderedDict(),  # seq -> monotonic time of library emits whose level was left before the answer came
+    "TIMEOUT": 15,  # seconds an orphan is awaited, volumio answers errors with a toast only
+    "HITS": 0,
+    "MISSES": 0,
+    "LOCK": Lock()
+}
+TRACE_DICT = {  # span tracing, see trace_begin(), dumped by trace_dump()
+    "ENABLED": None,
+    "FILE": None,
+    "SIZE": 1000,  # spans per stage in the rolling histograms
+    "SPANS": {},  # stage -> deque of ms
+    "COUNTER": 0,
+    "EMITTED": None,  # event of the last emit, continued by the next answer of volumio
+    "REPLY": 2,  # seconds an answer of volumio is accounted to the emit before
+    "LOCAL": local(),  # .cause = (id, kind, monotonic start) of the event the thread works on
+    "LOCK": RLock()  # reentrant, trace_dump() runs as signal handler on the main thread, which may hold it already
+}
+
+
+def repeat_curve(key, default):
+    """auto-repeat curve of a held button from config, 'first delay ms,shortest interval ms,factor per repeat'"""
+    first, shortest, factor = [float(x) for x in str(get_config(key, default)).split(',')]
+    return first / 1000.0, shortest / 1000.0, factor
+
+
+REPEAT_DICT = {
+    "VOLUME": None,
+    "SCROLL": None,
+    "SEEK": None,
+    "JUMP": None,
+    "PIN": None,  # held button, None if nothing repeats
+    "STEP": None,  # (function, args), repeats stop when function returns False
+    "CURVE": None,
+    "INTERVAL": 0,  # seconds until the next repeat, shrinks by the factor of the curve
+    "DUE": 0,  # monotonic time of the next repeat
+    "COND": Condition()
+}
+BOUNCETIME = 0.25  # seconds RPi.GPIO drops further edges of a button
+INDEX_DICT = {  # initial letters of the browse list for jumps, see letter_index()
+    "NAMES": None,  # list the index is for
+    "INDEX": None,  # (rank of the initial per entry, first entry per rank), None if the list has less than 2 initials
+    "INITIALS": {},  # first character -> initial letter, '#' for digits and symbols
+    "SORTKEYS": {},  # initial letter -> locale sort key
+    "TAP": (None, 0, 0),  # (pin, monotonic time, marker before) of the last X/Y press in a list
+    "DOUBLETAP": None  # seconds between two presses of a double tap, has to be above the bouncetime of the buttons, 0 disables it
+}
+
+
+def config_apply():
+    """applies config.json to the dicts, at start and on SIGHUP (systemctl reload), gpio_ybutton needs a restart"""
+    IMAGE_DICT['PARTIAL'] = bool(get_config('partial_update', True))
+    NAV_DICT['LISTMAX'] = int(OBJ['listmax']['value'])
+    TEXT_DICT['MAX_ENTRIES'] = int(get_config('textcache_entries', 256))
+    CLOCK_DICT['RATE'] = float(get_config('clock_rate', 1))
+    if CLOCK_DICT['RATE'] < 0.1:  # 0 or negative would stop the clock thread
+        print('clock_rate has to be at least 0.1, using 0.1')
+        CLOCK_DICT['RATE'] = 0.1
+    CLOCK_DICT['RESYNC'] = float(get_config('clock_resync', 60))
+    ARTCACHE_DICT['MAX_ENTRIES'] = int(get_config('artcache_entries', 24))
+    ARTCACHE_DICT['MAX_BYTES'] = int(get_config('artcache_mb', 8)) * 1024 * 1024
+    ARTCACHE_DICT['DISK_MAX_ENTRIES'] = int(get_config('artcache_disk_entries', 256))
+    ARTCACHE_DICT['DISK_MAX_BYTES'] = int(get_config('artcache_disk_mb', 32)) * 1024 * 1024
+    ARTDECODE_DICT['QUALITY'] = get_config('art_quality', 'speed')
+    ARTDECODE_DICT['BLUR'] = get_config('art_blur', 'box')
+    ARTDECODE_DICT['RADIUS'] = float(get_config('art_blur_radius', 2))
+    ARTFETCH_DICT['CONNECT_TIMEOUT'] = float(get_config('art_connect_timeout', 2))
+    ARTFETCH_DICT['READ_TIMEOUT'] = float(get_config('art_read_timeout', 5))
+    ARTFETCH_DICT['MAX_BYTES'] = int(get_config('art_max_kb', 4096)) * 1024
+    ARTFETCH_DICT['WAIT'] = float(get_config('art_wait_ms', 300)) / 1000
+    ARTFETCH_DICT['REVALIDATE'] = float(get_config('art_revalidate', 600))
+    AIO_DICT['RETRY'] = float(get_config('art_retry', 60))
+    PREFETCH_DICT['COUNT'] = int(get_config('prefetch_count', 3))
+    MARQUEE_DICT['FPS'] = float(get_config('marquee_fps', 15))
+    MARQUEE_DICT['SPEED'] = float(get_config('marquee_speed', 40))
+    MARQUEE_DICT['PAUSE'] = float(get_config('marquee_pause_ms', 1500)) / 1000
+    BROWSE_DICT['MAX_ENTRIES'] = int(get_config('browsecache_entries', 32))
+    BROWSE_DICT['MAX_BYTES'] = int(get_config('browsecache_kb', 2048)) * 1024
+    BROWSE_DICT['TTL'] = float(get_config('browsecache_ttl', 300))
+    TRACE_DICT['ENABLED'] = bool(get_config('trace', False)) or bool(os.environ.get('PIRATEAUDIO_TRACE'))
+    TRACE_DICT['FILE'] = get_config('trace_file', '')
+    REPEAT_DICT['VOLUME'] = repeat_curve('repeat_volume', '500,100,0.8')
+    REPEAT_DICT['SCROLL'] = repeat_curve('repeat_scroll', '400,50,0.8')
+    REPEAT_DICT['SEEK'] = repeat_curve('repeat_seek', '600,200,0.8')
+    REPEAT_DICT['JUMP'] = repeat_curve('repeat_jump', '600,300,0.9')
+    INDEX_DICT['DOUBLETAP'] = float(get_config('doubletap_ms', 500)) / 1000
+    if 0 < INDEX_DICT['DOUBLETAP'] <= BOUNCETIME:  # the second press would be dropped as bounce
+        print('doubletap_ms has to be above the bouncetime of %d ms' % (BOUNCETIME * 1000))
+        INDEX_DICT['DOUBLETAP'] = 2 * BOUNCETIME
+
+
+def config_reload(*args):
+    """rereads config.json on SIGHUP"""
+    start = monotonic()
+    try:
+        OBJ.update(config_read())
+    except (OSError, ValueError) as e:
+        print('ERROR at config reload:', e)
+        return
+    config_apply()
+    if OBJ['gpio_ybutton']['value'] != BUTTONS[3]:
+        print('gpio_ybutton changed, needs a restart of the service')
+    VOLUMIO_DICT['STATE_LAST'] = None  # next pushstate gets rendered with the new values
+    print('config reloaded in %.1f ms' % ((monotonic() - start) * 1000))
+
+
+config_apply()
 
 BUTTONS = [5, 6, 16, OBJ['gpio_ybutton']['value']]
+STARTUP.append(('assets', monotonic()))
 # LABELS = ['A', 'B', 'X', 'Y']
-GPIO.setmode(GPIO.BCM)  # Set up RPi.GPIO with BCM numbering scheme
+SOCKETIO = None  # connected in startup(), so the render functions can be imported without volumio (benchmark)
 
 # debug
 # import PIL
@@ -124,31 +465,34 @@ GPIO.setmode(GPIO.BCM)  # Set up RPi.GPIO with BCM numbering scheme
 def clean(*args):
     """cleanes up at exit, even if service is stopped"""
     display_stuff(IMAGE_DICT['BG_DEFAULT'], OBJ_TRANS['DISPLAY']['SHUTDOWN'], 0, 0, 'info')  # v0.0.7
+    render_wait(1)
     sleep(1)  # v0.0.7
-    DISP.set_backlight(False)
+    backlight(False)
     GPIO.cleanup(BUTTONS)  # v0.0.4
+    if TRACE_DICT['FILE']:
+        trace_dump()
     sys.exit(0)
 
 
-for sig in (signal.SIGABRT, signal.SIGILL, signal.SIGINT, signal.SIGSEGV, signal.SIGTERM):
-    signal.signal(sig, clean)
-
-
 def on_connect():
     """execute some stuff on connect"""
     # start_time = time()  # debug, time of code execution
+    trace_begin('connect')
     SOCKETIO.on('pushState', on_push_state)
-    SOCKETIO.emit('getState', '', on_push_state)
+    SOCKETIO.emit('getState')  # volumio answers with pushState, no ack
     SOCKETIO.on('pushBrowseSources', on_push_browsesources)
     SOCKETIO.on('pushBrowseLibrary', on_push_browselibrary)
     SOCKETIO.on('pushQueue', on_push_queue)
-    SOCKETIO.emit('getQueue', on_push_queue)
+    SOCKETIO.emit('getQueue')
+    trace_end()
     # print("on_connect--- %s seconds ---" % (time() - start_time))  # debug, time of code execution
 
 
 def on_disconnect():
     """changes display on disconnect"""
+    trace_begin('disconnect')
     display_stuff(IMAGE_DICT['BG_DEFAULT'], OBJ_TRANS['DISPLAY']['LOSTCONNECTION'], 0, 0, 'info')
+    trace_end()
 
 
 def navigation_handler():
@@ -171,30 +515,150 @@ def navigation_handler():
 def on_push_browsesources(*args):
     """processes websocket informations of browsesources"""
     # start_time = time()  # debug, time of code execution
+    trace_reply('browse')
+    pending = browse_answer(True)
+    if pending is None:  # not asked for, sources or plugins changed, the library may have too
+        browse_invalidate()
+    names, uris = [], []
+    for source in args[0]:  # one pass, aligned
+        names.append(source.get('name') or '')
+        uris.append(source.get('uri') or '')
+    entry = browse_store('', names, uris, [], [])  # no types, A on a source always browses
     if VOLUMIO_DICT['MODE'] == 'navigation':  # v.0.0.4 added, to make sure this getting not displayed on_connect
-        global NAV_DICT, NAV_ARRAY_NAME, NAV_ARRAY_URI
-        NAV_DICT['LISTRESULT'] = len(args[0])
-        NAV_ARRAY_NAME = [args[0][i]['name'] for i in range(NAV_DICT['LISTRESULT']) if VOLUMIO_DICT['MODE'] == 'navigation']
-        NAV_ARRAY_URI = [args[0][i]['uri'] for i in range(NAV_DICT['LISTRESULT']) if VOLUMIO_DICT['MODE'] == 'navigation']
-        display_stuff(IMAGE_DICT['BG_DEFAULT'], NAV_ARRAY_NAME, NAV_DICT['MARKER'], 0)
+        browse_show('', entry, *(pending[2:] if pending is not None else (0, 0)))
+    trace_end()
     # print("on_push_browsesources--- %s seconds ---" % (time() - start_time))  # debug, time of code execution
 
 
 def on_push_browselibrary(*args):
     """processes websocket informations of browselibrary"""
     # start_time = time()  # debug, time of code execution
-    global NAV_DICT, NAV_ARRAY_SERVICE, NAV_ARRAY_TYPE, NAV_ARRAY_NAME, NAV_ARRAY_URI
+    trace_reply('browse')
+    pending = browse_answer(False)
+    if pending is None:  # answer of a level that was left meanwhile
+        trace_end()
+        return
+    uri, marker, liststart = pending[1:]
+    names, uris, types, services = [], [], [], []
+    for item in args[0]['navigation']['lists'][0]['items']:  # one pass, missing keys stay empty so the arrays stay aligned
+        names.append(item.get('title') or '')
+        uris.append(item.get('uri') or '')
+        types.append(sys.intern(str(item.get('type') or '')))  # few distinct values, shared
+        services.append(sys.intern(str(item.get('service') or '')))
+    entry = browse_store(uri, names, uris, types, services)  # the payload is not referenced anymore
+    if names:
+        print('browse: %d items, %.1f bytes per item' % (len(names), float(entry[5]) / len(names)))
+    browse_show(uri, entry, marker, liststart)
+    trace_end()
+    # print("on_push_browselibrary--- %s seconds ---" % (time() - start_time))  # debug, time of code execution
+
+
+def browse_store(uri, names, uris, types, services):
+    """compact entry of a browse result, cached under uri unless uri is None"""
+    names, uris = TextColumn(names), TextColumn(uris)
+    size = names.nbytes() + uris.nbytes() + sys.getsizeof(types) + sys.getsizeof(services)
+    entry = (monotonic(), names, uris, types, services, size)
+    if uri is None:
+        return entry
+    with BROWSE_DICT['LOCK']:
+        old = BROWSE_DICT['ENTRIES'].pop(uri, None)
+        if old is not None:
+            BROWSE_DICT['BYTES'] -= old[5]
+        BROWSE_DICT['ENTRIES'][uri] = entry
+        BROWSE_DICT['BYTES'] += size
+        while len(BROWSE_DICT['ENTRIES']) > BROWSE_DICT['MAX_ENTRIES'] or BROWSE_DICT['BYTES'] > BROWSE_DICT['MAX_BYTES']:
+            BROWSE_DICT['BYTES'] -= BROWSE_DICT['ENTRIES'].popitem(last=False)[1][5]
+    return entry
+
+
+def browse_get(uri):
+    """cached entry of uri if not older than the ttl, else None"""
+    with BROWSE_DICT['LOCK']:
+        entry = BROWSE_DICT['ENTRIES'].get(uri)
+        if entry is not None and monotonic() - entry[0] > BROWSE_DICT['TTL']:
+            BROWSE_DICT['BYTES'] -= entry[5]
+            del BROWSE_DICT['ENTRIES'][uri]
+            entry = None
+        if entry is None:
+            BROWSE_DICT['MISSES'] += 1
+            return None
+        BROWSE_DICT['ENTRIES'].move_to_end(uri)
+        BROWSE_DICT['HITS'] += 1
+        return entry
+
+
+def browse_invalidate():
+    """forgets all browse results, when the sources changed or a library rescan finished"""
+    with BROWSE_DICT['LOCK']:
+        BROWSE_DICT['ENTRIES'].clear()
+        BROWSE_DICT['BYTES'] = 0
+
+
+def browse_answer(sources):
+    """(seq, uri, marker, liststart) of the emit an answer belongs to, None if it belongs to no emit that is still awaited,
+    volumio answers in order, so answers of left levels come first"""
+    now = monotonic()
+    orphans = BROWSE_DICT['ORPHANS']
+    if not sources:
+        while orphans:
+            seq, sent = orphans.popitem(last=False)
+            if now - sent < BROWSE_DICT['TIMEOUT']:  # older ones got no answer
+                return None
+    pending = BROWSE_DICT['PENDING']
+    if pending is None or (pending[1] == '') != sources:
+        return None
+    BROWSE_DICT['PENDING'] = None
+    return pending
+
+
+def browse_abandon():
+    """the awaited answer is not wanted anymore, the level was left or another one was asked for"""
+    pending = BROWSE_DICT['PENDING']
+    if pending is not None and pending[1] != '':  # getBrowseSources is answered by pushBrowseSources, not counted
+        BROWSE_DICT['ORPHANS'][pending[0]] = monotonic()
+    BROWSE_DICT['PENDING'] = None
+
+
+def browse_show(uri, entry, marker=0, liststart=0):
+    """makes entry the browse level shown, with marker and page"""
+    global NAV_ARRAY_NAME, NAV_ARRAY_URI, NAV_ARRAY_TYPE, NAV_ARRAY_SERVICE
+    browse_abandon()  # shown level changes, a late answer for another level must not replace it
     reset_variable('navigation')
-    NAV_DICT['LISTRESULT'] = len(args[0]['navigation']['lists'][0]['items'])  # v.0.0.4 code cleaning
+    NAV_ARRAY_NAME, NAV_ARRAY_URI, NAV_ARRAY_TYPE, NAV_ARRAY_SERVICE = entry[1:5]
+    NAV_DICT['LISTRESULT'] = len(NAV_ARRAY_NAME)  # v.0.0.4 code cleaning
+    NAV_DICT['MARKER'] = min(marker, max(NAV_DICT['LISTRESULT'] - 1, 0))
+    if not liststart <= NAV_DICT['MARKER'] < liststart + NAV_DICT['LISTMAX']:  # list got shorter meanwhile
+        liststart = int(floor(NAV_DICT['MARKER']/NAV_DICT['LISTMAX'])*NAV_DICT['LISTMAX'])
+    NAV_DICT['LISTSTART'] = liststart
+    BROWSE_DICT['CURRENT'] = uri
     if NAV_DICT['LISTRESULT'] > 0:  # we have item entries
-        NAV_ARRAY_SERVICE = [args[0]['navigation']['lists'][0]['items'][i]['service'] for i in range(NAV_DICT['LISTRESULT']) if 'service' in args[0]['navigation']['lists'][0]['items'][i]]
-        NAV_ARRAY_TYPE = [args[0]['navigation']['lists'][0]['items'][i]['type'] for i in range(NAV_DICT['LISTRESULT'])]
-        NAV_ARRAY_NAME = [args[0]['navigation']['lists'][0]['items'][i]['title'] for i in range(NAV_DICT['LISTRESULT']) if 'title' in args[0]['navigation']['lists'][0]['items'][i]]
-        NAV_ARRAY_URI = [args[0]['navigation']['lists'][0]['items'][i]['uri'] for i in range(NAV_DICT['LISTRESULT']) if 'uri' in args[0]['navigation']['lists'][0]['items'][i]]
         display_stuff(IMAGE_DICT['BG_DEFAULT'], NAV_ARRAY_NAME, NAV_DICT['MARKER'], NAV_DICT['LISTSTART'])
-    elif NAV_DICT['LISTRESULT'] == 0:  # we have no item entries
+    else:  # we have no item entries
         display_stuff(IMAGE_DICT['BG_DEFAULT'], OBJ_TRANS['DISPLAY']['EMPTY'], NAV_DICT['MARKER'], NAV_DICT['LISTSTART'])
-    # print("on_push_browselibrary--- %s seconds ---" % (time() - start_time))  # debug, time of code execution
+
+
+def browse_open(uri, marker=0, liststart=0):
+    """shows the browse level uri ('' for the sources) from cache, or asks volumio for it"""
+    entry = browse_get(uri)
+    if entry is not None:
+        browse_show(uri, entry, marker, liststart)
+        return
+    browse_abandon()  # only the latest emit counts
+    BROWSE_DICT['SEQ'] += 1
+    BROWSE_DICT['PENDING'] = (BROWSE_DICT['SEQ'], uri, marker, liststart)
+    if uri == '':
+        SOCKETIO.emit('getBrowseSources')
+    else:
+        SOCKETIO.emit('browseLibrary', {'uri': uri})
+
+
+def browse_back():
+    """shows the parent level with its marker and page, returns False at the top level"""
+    if not BROWSE_DICT['HISTORY']:
+        return False
+    browse_abandon()  # the child level is left, even if it did not come yet
+    browse_open(*BROWSE_DICT['HISTORY'].pop())
+    return True
 
 
 def reset_variable(varmode):
@@ -202,121 +666,370 @@ def reset_variable(varmode):
     # start_time = time()  # debug, time of code execution
     global VOLUMIO_DICT, NAV_ARRAY_SERVICE, NAV_ARRAY_NAME, NAV_ARRAY_URI, NAV_ARRAY_TYPE, NAV_DICT, IMAGE_DICT
     VOLUMIO_DICT['MODE'] = varmode
-    del NAV_ARRAY_NAME[:]
-    del NAV_ARRAY_URI[:]
-    del NAV_ARRAY_TYPE[:]
-    del NAV_ARRAY_SERVICE[:]
+    NAV_ARRAY_NAME, NAV_ARRAY_URI, NAV_ARRAY_TYPE, NAV_ARRAY_SERVICE = [], [], [], []  # browse results are immutable TextColumns
     NAV_DICT['MARKER'], NAV_DICT['LISTSTART'] = 0, 0
-    IMAGE_DICT['IMG_CHECK'], VOLUMIO_DICT['ALBUMART'], VOLUMIO_DICT['STATE_LAST'] = '', '', None  # reset albumart so display gets refreshed
+    if varmode != 'navigation':  # left the library, next time it starts at the sources
+        del BROWSE_DICT['HISTORY'][:]
+        browse_abandon()
+        BROWSE_DICT['CURRENT'] = None
+    VOLUMIO_DICT['ALBUMART'], VOLUMIO_DICT['STATE_LAST'] = '', None  # reset albumart so display gets refreshed
+    RENDER_DICT['GENERATION'] += 1  # pending renders of the emptied lists are stale
     # print("reset_variable--- %s seconds ---" % (time() - start_time))  # debug, time of code execution
 
 
-def sendtodisplay(img4):
-    """send img to display"""
+def render_defer(function, *args):
+    """hands a render over to the render worker, returns False if the caller has to render itself"""
+    if RENDER_DICT['THREAD'] is None or current_thread() is RENDER_DICT['THREAD']:
+        return False
+    with RENDER_DICT['COND']:
+        RENDER_DICT['SUBMITTED'] += 1
+        if RENDER_DICT['PENDING'] is not None:
+            RENDER_DICT['COALESCED'] += 1
+        RENDER_DICT['PENDING'] = (function, args, VOLUMIO_DICT['MODE'], RENDER_DICT['GENERATION'], trace_cause(), trace_start())
+        RENDER_DICT['COND'].notify_all()
+    return True
+
+
+def render_wait(timeout):
+    """waits until the render worker has drawn everything requested so far"""
+    with RENDER_DICT['COND']:
+        RENDER_DICT['COND'].wait_for(lambda: RENDER_DICT['PENDING'] is None and not RENDER_DICT['BUSY'], timeout)
+
+
+def render_helper():
+    """helper function as thread, the only one drawing to the display, renders only the latest request"""
+    while True:
+        with RENDER_DICT['COND']:
+            RENDER_DICT['COND'].wait_for(lambda: RENDER_DICT['PENDING'] is not None)
+            function, args, mode, generation, cause, submitted = RENDER_DICT['PENDING']
+            RENDER_DICT['PENDING'], RENDER_DICT['BUSY'] = None, True
+        trace_span('render_wait', submitted)
+        trace_adopt(cause)  # the frame carries the id of the event that asked for it
+        try:
+            if mode != VOLUMIO_DICT['MODE'] or generation != RENDER_DICT['GENERATION']:
+                RENDER_DICT['DROPPED'] += 1
+            else:
+                start = trace_start()
+                function(*args)
+                trace_span('render', start)
+                RENDER_DICT['RENDERED'] += 1
+        except Exception as e:  # keep the worker alive, the next request redraws anyway
+            print('ERROR at render:', e)
+        trace_end()
+        with RENDER_DICT['COND']:
+            RENDER_DICT['BUSY'] = False
+            RENDER_DICT['COND'].notify_all()
+
+
+def trace_start():
+    """monotonic start of a span, None if tracing is disabled"""
+    if TRACE_DICT['ENABLED']:
+        return monotonic()
+    return None
+
+
+def trace_span(stage, start):
+    """adds the time since start (ms) to the rolling histogram of stage"""
+    if start is None:
+        return
+    with TRACE_DICT['LOCK']:
+        if stage not in TRACE_DICT['SPANS']:
+            TRACE_DICT['SPANS'][stage] = deque(maxlen=TRACE_DICT['SIZE'])
+        TRACE_DICT['SPANS'][stage].append((monotonic() - start) * 1000)
+
+
+def trace_begin(kind):
+    """starts a new event (button, state, clock) on this thread, renders caused by it carry its id"""
+    if not TRACE_DICT['ENABLED']:
+        return None
+    with TRACE_DICT['LOCK']:
+        TRACE_DICT['COUNTER'] += 1
+        cause = (''.join([kind, '-', str(TRACE_DICT['COUNTER'])]), kind, monotonic())
+    TRACE_DICT['LOCAL'].cause = cause
+    return cause
+
+
+def trace_reply(kind):
+    """event of a websocket message, continues the event of the last emit if it was recent (button, pushstate, photon)"""
+    if not TRACE_DICT['ENABLED']:
+        return None
+    emitted = TRACE_DICT['EMITTED']
+    if emitted is not None and monotonic() - emitted[2] < TRACE_DICT['REPLY']:
+        TRACE_DICT['EMITTED'] = None
+        TRACE_DICT['LOCAL'].cause = emitted
+        return emitted
+    return trace_begin(kind)
+
+
+def trace_end():
+    """ends the event of this thread, so later work of the thread is not attributed to it"""
+    if TRACE_DICT['ENABLED']:
+        TRACE_DICT['LOCAL'].cause = None
+
+
+def trace_emitted():
+    """marks the event of this thread as waiting for the answer of volumio"""
+    if TRACE_DICT['ENABLED']:
+        TRACE_DICT['EMITTED'] = trace_cause()
+
+
+def trace_cause():
+    """event of this thread, None if tracing is disabled"""
+    if not TRACE_DICT['ENABLED']:
+        return None
+    return getattr(TRACE_DICT['LOCAL'], 'cause', None)
+
+
+def trace_adopt(cause):
+    """continues the event cause on this thread"""
+    if TRACE_DICT['ENABLED']:
+        TRACE_DICT['LOCAL'].cause = cause
+
+
+def trace_frame():
+    """end of a frame, records event to photon latency, returns the id of the event"""
+    cause = trace_cause()
+    if cause is None:
+        return None
+    trace_span(''.join([cause[1], '_to_photon']), cause[2])
+    return cause[0]
+
+
+def trace_dump(*args):
+    """prints the rolling histograms (ms), and writes them to trace_file if configured, on SIGUSR1"""
+    if not TRACE_DICT['ENABLED']:
+        print('tracing disabled, enable trace in config.json or set PIRATEAUDIO_TRACE=1')
+        return
+    result = {}
+    with TRACE_DICT['LOCK']:
+        spans = dict((stage, sorted(values)) for stage, values in TRACE_DICT['SPANS'].items())
+    for stage, values in sorted(spans.items()):
+        result[stage] = {"count": len(values)}
+        for p in (50, 95, 99):
+            result[stage][''.join(['p', str(p)])] = round(values[max(int(ceil(p / 100.0 * len(values))) - 1, 0)], 3)
+        result[stage]['max'] = round(values[-1], 3)
+        print('%-24s %6d %9.3f %9.3f %9.3f %9.3f' % (stage, len(values), result[stage]['p50'], result[stage]['p95'], result[stage]['p99'], result[stage]['max']))
+    if TRACE_DICT['FILE']:
+        try:
+            with open(TRACE_DICT['FILE'], 'w') as mytracefile:
+                json.dump(result, mytracefile, indent=2)
+        except OSError as e:
+            print('ERROR at trace:', e)
+
+
+def icon_sprite(name, color):
+    """rasterizes and tints one icon of the atlas"""
+    glyph = ICON_DICT['GLYPHS'][name]
+    size = text_size(glyph, FONT_DICT['FONT_FAS'])
+    mask = Image.new('L', size, 0)
+    ImageDraw.Draw(mask).text((0, 0), glyph, font=FONT_DICT['FONT_FAS'], fill=255)
+    ICON_DICT['SPRITES'][(name, color)] = (Image.new('RGB', size, color), mask)
+    return ICON_DICT['SPRITES'][(name, color)]
+
+
+def icon_atlas():
+    """prerenders all icons in white (menus) and in the text color of every palette (player)"""
+    colors = set([(255, 255, 255)] + [palette['TXT_COL'] for palette in PALETTE_DICT.values()])
+    for name in ICON_DICT['GLYPHS']:
+        for color in colors:
+            icon_sprite(name, color)
+
+
+def icon_draw(image, xy, name, color=(255, 255, 255)):
+    """blits an icon of the atlas, replaces drawing Fontawesome text"""
+    sprite = ICON_DICT['SPRITES'].get((name, color))
+    if sprite is None:  # color not in any palette
+        sprite = icon_sprite(name, color)
+    image.paste(sprite[0], xy, sprite[1])
+
+
+def text_entry(text, font):
+    """cached [size, mask] of text, mask gets rendered on first draw"""
+    key = (text, font.path, font.size)
+    with TEXT_DICT['LOCK']:
+        entry = TEXT_DICT['ENTRIES'].get(key)
+        if entry is not None:
+            TEXT_DICT['ENTRIES'].move_to_end(key)
+            TEXT_DICT['HITS'] += 1
+            return entry
+        TEXT_DICT['MISSES'] += 1
+    if hasattr(font, 'getsize'):
+        size = font.getsize(text)
+    else:  # Pillow >= 10
+        size = font.getbbox(text)[2:]
+    entry = [size, None]
+    with TEXT_DICT['LOCK']:
+        TEXT_DICT['ENTRIES'][key] = entry
+        while len(TEXT_DICT['ENTRIES']) > TEXT_DICT['MAX_ENTRIES']:
+            TEXT_DICT['ENTRIES'].popitem(last=False)
+    return entry
+
+
+def text_size(text, font):
+    """helper for width and height of text, replaces draw.textsize"""
+    return text_entry(text, font)[0]
+
+
+def text_draw(draw, xy, text, font, fill):
+    """draws text by pasting its cached alpha mask, replaces draw.text"""
+    entry = text_entry(text, font)
+    if entry[1] is None:
+        mask = Image.new('L', (max(entry[0][0], 1), max(entry[0][1], 1)), 0)
+        ImageDraw.Draw(mask).text((0, 0), text, font=font, fill=255)
+        entry[1] = mask
+    draw.bitmap(xy, entry[1], fill=fill)
+
+
+def sendtodisplay(img4, regions=None, stage='spi'):
+    """send img to display through the rgb565 framebuffer, only the changed rectangles if partial update is enabled,
+    only the rectangles in regions are converted if given (marquees), stage is the span of the transfer"""
     # start_time = time()  # debug, time of code execution
     global IMAGE_DICT
-    IMAGE_DICT['LASTREFRESH'] = time()
-    DISP.display(img4)
+    with IMAGE_DICT['LOCK']:
+        IMAGE_DICT['LASTREFRESH'] = time()
+        if not hasattr(DISP, 'set_window'):  # driver without windows, let it convert the image itself
+            DISP.display(img4)
+            return
+        start = trace_start()
+        framebuffer = IMAGE_DICT['FRAMEBUFFER']
+        if regions is None:
+            boxes = framebuffer.paste(img4)
+        else:
+            boxes = []
+            for region in regions:
+                boxes.extend(framebuffer.paste(img4.crop(region), region[:2]))
+        area = sum((box[2] - box[0]) * (box[3] - box[1]) for box in boxes)
+        if not IMAGE_DICT['PARTIAL'] or area > IMAGE_DICT['DIRTY_MAX'] * IMAGE_DICT['WIDTH'] * IMAGE_DICT['HEIGHT']:
+            boxes = [(0, 0, IMAGE_DICT['WIDTH'], IMAGE_DICT['HEIGHT'])]
+        for box in boxes:  # column/row window (CASET/RASET) of the ST7789, the bytes are already rgb565
+            DISP.set_window(*framebuffer.window(box))
+            DISP.data(framebuffer.data(box))
+        trace_span(stage, start)
+        cause = trace_frame()
+        if hasattr(DISP, 'end_frame'):  # simulators count and capture frames
+            DISP.end_frame(cause)
     # print("sendtodisplay--- %s seconds ---" % (time() - start_time))  # debug, time of code execution
 
 
+def page_layout(text, start, icons, pagestring):
+    """layout of a display_stuff screen: rows and draw operations in drawing order, with bounding boxes"""
+    rows, ops = {}, []
+    if isinstance(text, (list, TextColumn)):  # check if text is array
+        # Loop for finding out the sum of textheight for positioning, only text to display
+        listbis = min(start + NAV_DICT['LISTMAX'], len(text))
+        totaltextheight = 0
+        for i in range(start, listbis):  # v.0.0.4 range max werteliste
+            totaltextheight += text_size(text[i], FONT_DICT['FONT_M'])[1]
+        Y = (IMAGE_DICT['HEIGHT'] // 2) - (totaltextheight // 2)  # startheight
+        for i in range(start, listbis):  # v.0.0.4
+            len1, hei1 = text_size(text[i], FONT_DICT['FONT_M'])
+            X2 = max((IMAGE_DICT['WIDTH'] - len1)//2, 0)  # v.0.0.4 dont center text if to long
+            rows[i] = (X2, Y, len1, hei1, text[i], (X2, Y, X2 + len1 + 3, Y + hei1 + 3))  # box including shadow
+            ops.append(('row', rows[i][5], i))
+            Y += hei1  # add line to startheigt for next entry
+    else:
+        len1, hei1 = text_size(text, FONT_DICT['FONT_M'])
+        X2, y2 = (IMAGE_DICT['WIDTH'] - len1)//2, (IMAGE_DICT['HEIGHT'] - hei1)//2
+        ops.append(('rect', (X2, y2, X2 + len1 + 1, y2 + hei1 + 1), (X2, y2, X2 + len1, y2 + hei1), (255, 255, 255)))
+        ops.append(('text', (X2, y2, X2 + len1, y2 + hei1), (X2, y2), text, (0, 0, 0)))
+    # draw symbols
+    for x, y, name in ICON_DICT['LAYOUTS'].get(icons, []):
+        w, h = (ICON_DICT['SPRITES'].get((name, (255, 255, 255))) or icon_sprite(name, (255, 255, 255)))[1].size
+        ops.append(('icon', (x, y, x + w, y + h), (x, y), name))
+    if pagestring:  # pageindicator
+        len1, hei1 = text_size(pagestring, FONT_DICT['FONT_M'])
+        X2, y2 = (IMAGE_DICT['WIDTH'] - len1)//2, IMAGE_DICT['HEIGHT'] - hei1
+        ops.append(('text', (X2, y2, X2 + len1, y2 + hei1), (X2, y2), pagestring, (255, 255, 255)))
+    return rows, ops
+
+
+def page_paint(image, box, page, marked, window=None):
+    """repaints box of image: background crop plus every draw operation touching box, marked row highlighted,
+    window is the marquee mask to draw instead of the text of the marked row"""
+    box = (max(box[0], 0), max(box[1], 0), min(box[2], IMAGE_DICT['WIDTH']), min(box[3], IMAGE_DICT['HEIGHT']))
+    dx, dy = box[0], box[1]
+    crop = page['BG'].crop(box)
+    draw = ImageDraw.Draw(crop, 'RGBA')
+    for op in page['OPS']:
+        bbox = op[1]
+        if bbox[0] >= box[2] or bbox[2] <= box[0] or bbox[1] >= box[3] or bbox[3] <= box[1]:
+            continue
+        if op[0] == 'row':
+            X2, Y, len1, hei1, text = page['ROWS'][op[2]][:5]
+            if op[2] == marked:
+                draw.rectangle((X2 - dx, Y + 2 - dy, X2 + len1 - dx, Y + hei1 - dy), (255, 255, 255))
+                if window is None:
+                    text_draw(draw, (X2 - dx, Y - dy), text, FONT_DICT['FONT_M'], (0, 0, 0))
+                else:
+                    draw.bitmap((X2 - dx, Y - dy), window, fill=(0, 0, 0))
+            else:
+                text_draw(draw, (X2 + 3 - dx, Y + 3 - dy), text, FONT_DICT['FONT_M'], (15, 15, 15))
+                text_draw(draw, (X2 - dx, Y - dy), text, FONT_DICT['FONT_M'], (255, 255, 255))
+        elif op[0] == 'rect':
+            draw.rectangle((op[2][0] - dx, op[2][1] - dy, op[2][2] - dx, op[2][3] - dy), op[3])
+        elif op[0] == 'text':
+            text_draw(draw, (op[2][0] - dx, op[2][1] - dy), op[3], FONT_DICT['FONT_M'], op[4])
+        elif op[0] == 'icon':
+            icon_draw(crop, (op[2][0] - dx, op[2][1] - dy), op[3])
+    image.paste(crop, box[:2])
+
+
+def page_get(key, background, text, start, icons, pagestring):
+    """rendered page without marker, from cache if possible"""
+    cache = background is IMAGE_DICT['BG_DEFAULT']
+    if cache and key in PAGE_DICT['ENTRIES']:
+        PAGE_DICT['ENTRIES'].move_to_end(key)
+        return PAGE_DICT['ENTRIES'][key]
+    rows, ops = page_layout(text, start, icons, pagestring)
+    page = {"BG": background, "ROWS": rows, "OPS": ops, "IMAGE": background.copy()}
+    page_paint(page['IMAGE'], (0, 0, IMAGE_DICT['WIDTH'], IMAGE_DICT['HEIGHT']), page, None)
+    if cache:
+        PAGE_DICT['ENTRIES'][key] = page
+        while len(PAGE_DICT['ENTRIES']) > PAGE_DICT['MAX_ENTRIES']:
+            PAGE_DICT['ENTRIES'].popitem(last=False)
+    return page
+
+
 def display_stuff(picture, text, marked, start, icons='nav'):  # v.0.0.4 test for better performance
-    """create image and overlays"""
+    """create image and overlays, pages are rendered once and only the marked rows get repainted"""
     # start_time = time()  # debug, time of code execution
     global NAV_DICT  # v.0.0.4
-
-    def f_drawtext(x, y, text, fontstring, fillstring=(255, 255, 255)):
-        """draw text"""
-        draw3.text((x, y), text, font=fontstring, fill=fillstring)
-
-    def f_drawsymbol(x, y, text, fontstring=FONT_DICT['FONT_FAS'], fillstring=(255, 255, 255)):
-        """draw symbols"""
-        draw3.text((x, y), text, font=fontstring, fill=fillstring)
-
-    def f_textcontent(text, start, listmax1):
-        """draw content"""
-        # start_time2 = time()  # debug, time of code execution
-        if isinstance(text, list):  # check if text is array
-            result = len(text)  # count items of list/array
-            totaltextheight = 0
-            i = 0
-            # Loop for finding out the sum of textheight for positioning, only text to display
-            listbis = start + listmax1
-            if listbis > result:
-                listbis = result
-            for i in range(start, listbis):  # v.0.0.4 range max werteliste
-                totaltextheight += f_xy(text[0+i], FONT_DICT['FONT_M'])[1]
-            Y = (IMAGE_DICT['HEIGHT'] // 2) - (totaltextheight // 2)  # startheight
-            i = 0
-
-            # Loop for creating text to display
-            for i in range(start, listbis):  # v.0.0.4
-                XY = f_xy(text[0+i], FONT_DICT['FONT_M'])
-                hei1 = XY[1]
-                X2 = XY[2]
-                if X2 < 0:  # v.0.0.4 dont center text if to long
-                    X2 = 0
-                if i == marked:
-                    draw3.rectangle((X2, Y + 2, X2 + XY[0], Y + hei1), (255, 255, 255))
-                    f_drawtext(X2, Y, text[0+i], FONT_DICT['FONT_M'], (0, 0, 0))
-                else:
-                    f_drawtext(X2 + 3, Y + 3, text[0+i], FONT_DICT['FONT_M'], (15, 15, 15))
-                    f_drawtext(X2, Y, text[0+i], FONT_DICT['FONT_M'])
-                Y += hei1  # add line to startheigt for next entry
-        else:
-            result = 1  # needed for right pageindex
-            XY = f_xy(text, FONT_DICT['FONT_M'])
-            len1 = XY[0]
-            hei1 = XY[1]
-            X2 = XY[2]
-            y2 = XY[3]
-            draw3.rectangle((X2, y2, X2 + len1, y2 + hei1), (255, 255, 255))
-            f_drawtext(X2, y2, text, FONT_DICT['FONT_M'], (0, 0, 0))
-        # print("def_ftextcontent--- %s seconds ---" % (time() - start_time2))  # debug, time of code execution
-        return result
-
-    def f_xy(text, font):
-        """helper for width and height of text"""
-        len1, hei1 = draw3.textsize(text, font)
-        x = (IMAGE_DICT['WIDTH'] - len1)//2
-        Y = (IMAGE_DICT['HEIGHT'] - hei1)//2
-        return [len1, hei1, x, Y]
-
-    def f_page(marked, listmax2, result):
-        """pageindicator"""
-        page = int(ceil((float(marked) + 1)/float(listmax2)))
-        pages = int(ceil(float(result)/float(listmax2)))
+    if render_defer(display_stuff, picture, text, marked, start, icons):
+        return
+    pagestring = ''
+    if isinstance(text, (list, TextColumn)):
+        page = int(ceil((float(marked) + 1)/float(NAV_DICT['LISTMAX'])))
+        pages = int(ceil(float(len(text))/float(NAV_DICT['LISTMAX'])))
         if pages != 1:  # only show index if more than one site
             pagestring = ''.join([str(page), '/', str(pages)])
-            XY = f_xy(pagestring, FONT_DICT['FONT_M'])
-            f_drawtext(XY[2], IMAGE_DICT['HEIGHT'] - XY[1], pagestring, FONT_DICT['FONT_M'])
-
-    if picture == IMAGE_DICT['BG_DEFAULT']:
-        IMAGE_DICT['IMG3'] = IMAGE_DICT['BG_DEFAULT'].copy()
+        key = (tuple(text[start:start + NAV_DICT['LISTMAX']]), start, icons, pagestring, NAV_DICT['LISTMAX'])
     else:
-        IMAGE_DICT['IMG3'] = Image.open(picture).convert('RGBA')  # v.0.0.4
-    draw3 = ImageDraw.Draw(IMAGE_DICT['IMG3'], 'RGBA')
-    result = f_textcontent(text, start, NAV_DICT['LISTMAX'])
-    # draw symbols
-    if icons == 'nav':
-        f_drawsymbol(0, 50, u"\uf14a")  # Fontawesome symbol ok
-        f_drawsymbol(210, 50, u"\uf151")  # Fontawesome symbol up
-        f_drawsymbol(0, 170, u"\uf0e2")  # Fontawesome symbol back
-        f_drawsymbol(210, 170, u"\uf150")  # Fontawesome symbol down
-    elif icons == 'info':
-        f_drawsymbol(10, 10, u"\uf05a")  # Fontawesome symbol info
-    elif icons == 'seek':
-        f_drawsymbol(210, 50, u"\uf04e")  # Fontawesome symbol forward
-        f_drawsymbol(0, 170, u"\uf0e2")  # Fontawesome symbol back
-        f_drawsymbol(210, 170, u"\uf04a")  # Fontawesome symbol backward
-    f_page(marked, NAV_DICT['LISTMAX'], result)
-    sendtodisplay(IMAGE_DICT['IMG3'])
+        key = (text, icons)
+    with IMAGE_DICT['LOCK']:
+        if picture is IMAGE_DICT['BG_DEFAULT']:
+            background = picture
+        else:
+            background = Image.open(picture).convert('RGBA')  # v.0.0.4
+        page = page_get(key, background, text, start, icons, pagestring)
+        if page is PAGE_DICT['PAGE']:  # same page, only move the marker
+            for i in (PAGE_DICT['MARKED'], marked):
+                if i in page['ROWS']:
+                    page_paint(IMAGE_DICT['IMG3'], page['ROWS'][i][5], page, marked)
+        else:
+            IMAGE_DICT['IMG3'] = page['IMAGE'].copy()
+            if marked in page['ROWS']:
+                page_paint(IMAGE_DICT['IMG3'], page['ROWS'][marked][5], page, marked)
+        PAGE_DICT['PAGE'], PAGE_DICT['MARKED'] = page, marked
+        marquees = []
+        if marked in page['ROWS'] and page['ROWS'][marked][2] > IMAGE_DICT['WIDTH'] and MARQUEE_DICT['FPS'] > 0:  # marked row too long
+            X2, Y, len1, hei1, text = page['ROWS'][marked][:5]
+            marquees.append({"KIND": 'row', "PAGE": page, "ROW": marked, "TEXT": text, "FONT": FONT_DICT['FONT_M'], "BOX": (0, max(Y, 0), IMAGE_DICT['WIDTH'], min(Y + hei1 + 3, IMAGE_DICT['HEIGHT'])), "START": monotonic(), "OFFSET": 0})
+        marquee_set(marquees)
+        sendtodisplay(IMAGE_DICT['IMG3'])
     # print("displaystuff--- %s seconds ---" % (time() - start_time))  # debug, time of code execution
 
 
-# position in code is important, so display_stuff works v.0.0.4
-display_stuff(IMAGE_DICT['BG_DEFAULT'], OBJ_TRANS['DISPLAY']['WAIT'], 0, 0, 'info')
-SOCKETIO = SocketIO('localhost', 3000)
+# icon_atlas() is called by startup() after the first frame, before it page_layout() and icon_draw() rasterize each icon when it is first needed
 
 
 def seeking(direction):
@@ -346,35 +1059,547 @@ def prevnext(direction):
             VOLUMIO_DICT['POSITION'] -= 1
         else:
             VOLUMIO_DICT['POSITION'] += 1
-        if VOLUMIO_DICT['POSITION'] > LEN_QUEUE - 1:  # set position to first entry to loop through playlist infinite
+        if VOLUMIO_DICT['POSITION'] > len(QUEUE_DICT['TRACKS']) - 1:  # set position to first entry to loop through playlist infinite
             VOLUMIO_DICT['POSITION'] = 0
         elif VOLUMIO_DICT['POSITION'] < 0:  # set position to last entry to loop through playlist infinite
-            VOLUMIO_DICT['POSITION'] = LEN_QUEUE - 1
-        display_stuff(IMAGE_DICT['BG_DEFAULT'], [''.join([str(VOLUMIO_DICT['POSITION'] + 1), '/', str(LEN_QUEUE)]), OBJ_TRANS['DISPLAY']['PREVNEXT'], TITLE_QUEUE[VOLUMIO_DICT['POSITION']]], 1, 0, 'seek')
+            VOLUMIO_DICT['POSITION'] = len(QUEUE_DICT['TRACKS']) - 1
+        prefetch_schedule()  # prefetch around the new position, before volumio pushes the new state
+        display_stuff(IMAGE_DICT['BG_DEFAULT'], prevnext_text(), 1, 0, 'seek')
         SOCKETIO.emit('stop')
         SOCKETIO.emit('play', {"value": VOLUMIO_DICT['POSITION']})
     # print("prevnext--- %s seconds ---" % (time() - start_time))  # debug, time of code execution
 
 
+def prevnext_text():
+    """position, label and title of the prev/next screen, from the queue model"""
+    tracks, position = QUEUE_DICT['TRACKS'], VOLUMIO_DICT['POSITION']
+    if not tracks or position is None:
+        return ['-/%d' % len(tracks), OBJ_TRANS['DISPLAY']['PREVNEXT'], '']
+    return [''.join([str(position % len(tracks) + 1), '/', str(len(tracks))]), OBJ_TRANS['DISPLAY']['PREVNEXT'], tracks[position % len(tracks)][0]]
+
+
 def on_push_queue(*args):
-    """processes websocket informations of queue"""
+    """processes websocket informations of queue, only entries that changed get parsed, see playqueue.merge()"""
     # start_time = time()  # debug, time of code execution
-    global TITLE_QUEUE, LEN_QUEUE
-    del TITLE_QUEUE[:]
-    LEN_QUEUE = 0  # v.0.0.7
-    if args[0]:  # v.0.0.7
-        LEN_QUEUE = len(args[0])
-        TITLE_QUEUE = [args[0][i]['name'] for i in range(LEN_QUEUE)]
+    trace_reply('queue')
+    items = args[0] or []  # v.0.0.7
+    new = playqueue.fingerprints(items)
+    unchanged = new == QUEUE_DICT['FINGERPRINTS']
+    QUEUE_DICT['TRACKS'], QUEUE_DICT['REUSED'], QUEUE_DICT['PARSED'] = playqueue.merge(QUEUE_DICT['TRACKS'], QUEUE_DICT['FINGERPRINTS'], new, items)
+    QUEUE_DICT['FINGERPRINTS'] = new
+    if not unchanged:
+        prefetch_schedule()
+    trace_end()
     # print("on_push_queue--- %s seconds ---" % (time() - start_time))  # debug, time of code execution
 
 
+def art_url(albumurl):
+    """normalizes albumart url, also used as key of the albumart cache"""
+    albumart2 = albumurl.strip()
+    if not albumart2:  # v0.0.7 hint pylint
+        albumart2 = 'http://localhost:3000/albumart'
+    if 'http' not in albumart2:
+        albumart2 = ''.join(['http://localhost:3000', albumart2])
+    return albumart2
+
+
+def art_palette(image, opaque=False):
+    """helper contrast, returns the values for TXT_COL, STR_COL, BAR_BGCOL, BAR_COL, DARK
+    opaque adds the alpha band of albumart decoded without one, keeps the thresholds of the former RGBA decode"""
+    stat = ImageStat.Stat(image).mean
+    if opaque and len(stat) == 3:
+        stat = stat + [255]
+    mn = sum(stat) / len(stat)
+    if mn > 175:
+        return dict(PALETTE_DICT['DARK'])
+    if mn < 80:
+        return dict(PALETTE_DICT['DIM'])
+    return dict(PALETTE_DICT['LIGHT'])
+
+
+def art_session():
+    """pooled keep-alive session for albumart, created on first use, as importing requests takes a while"""
+    if ARTFETCH_DICT['SESSION'] is None:
+        import requests
+        session = requests.Session()
+        session.mount('http://', requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=4))
+        session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=4))
+        ARTFETCH_DICT['SESSION'] = session
+    return ARTFETCH_DICT['SESSION']
+
+
+def art_fetch(url, validators=None):
+    """downloads albumart with the pooled session, returns (content, validators), content is None if unchanged (304) or not usable"""
+    headers = {}
+    if validators and validators.get('ETAG'):
+        headers['If-None-Match'] = validators['ETAG']
+    if validators and validators.get('MODIFIED'):
+        headers['If-Modified-Since'] = validators['MODIFIED']
+    response = art_session().get(url, headers=headers, stream=True, timeout=(ARTFETCH_DICT['CONNECT_TIMEOUT'], ARTFETCH_DICT['READ_TIMEOUT']))
+    try:
+        if response.status_code == 304:
+            return None, dict(validators or {}, CHECKED=time())
+        if response.status_code != 200:  # error pages are no albumart, cached art stays unchecked
+            print('ERROR at albumart, status %d:' % response.status_code, url)
+            return None, None
+        if int(response.headers.get('Content-Length') or 0) > ARTFETCH_DICT['MAX_BYTES']:
+            print('ERROR at albumart, too large:', url)
+            return None, None
+        chunks, size = [], 0
+        for chunk in response.iter_content(65536):
+            size += len(chunk)
+            if size > ARTFETCH_DICT['MAX_BYTES']:  # no or wrong content-length
+                print('ERROR at albumart, too large:', url)
+                return None, None
+            chunks.append(chunk)
+        return b''.join(chunks), {"ETAG": response.headers.get('ETag'), "MODIFIED": response.headers.get('Last-Modified'), "CHECKED": time()}
+    finally:
+        response.close()
+
+
+def art_process(url, validators=None):
+    """fetches, decodes and blurs albumart, returns (background, palette) or None if not displayable, and the new validators"""
+    content, validators = art_fetch(url, validators)
+    if content is None:
+        return None, validators
+    return art_decode(content, url), validators
+
+
+def art_decode(content, url):
+    """decodes and blurs fetched albumart, returns (background, palette) or None if not displayable"""
+    draft, resample = ARTDECODE_DICT['MODES'][ARTDECODE_DICT['QUALITY']]
+    try:  # to catch not displayable images
+        img = Image.open(BytesIO(content))
+        if img.format == 'JPEG':  # libjpeg decodes at 1/2, 1/4 or 1/8 scale, but at least the requested size
+            img.draft('RGB', (IMAGE_DICT['WIDTH'] * draft, IMAGE_DICT['HEIGHT'] * draft))
+        if 'A' in img.getbands() or 'transparency' in img.info:
+            img = img.convert('RGBA')  # v.0.04 gab bei spotify probleme
+        else:
+            img = img.convert('RGB')  # no alpha needed, a quarter less memory and work
+        img = img.resize((IMAGE_DICT['WIDTH'], IMAGE_DICT['HEIGHT']), resample)
+        img = art_blur(img)
+    except (ValueError, RuntimeError, OSError) as e:
+        print('ERROR at albumart:', url, e)
+        return None
+    return img, art_palette(img, True)
+
+
+def art_blur(img):
+    """blurs the background, pil: 5x5 kernel of former versions, box: one box blur,
+    stack: two box blurs of half the radius (the triangle kernel of a stack blur), none: no blur"""
+    if ARTDECODE_DICT['BLUR'] == 'pil':
+        return img.filter(ImageFilter.BLUR)
+    if ARTDECODE_DICT['BLUR'] == 'box':
+        return img.filter(ImageFilter.BoxBlur(ARTDECODE_DICT['RADIUS']))
+    if ARTDECODE_DICT['BLUR'] == 'stack':
+        half = ImageFilter.BoxBlur(ARTDECODE_DICT['RADIUS'] / 2.0)
+        return img.filter(half).filter(half)
+    return img
+
+
+def artcache_file(url):
+    """path of the on-disk cache entry of url, without extension"""
+    return os.path.join(ARTCACHE_DICT['PATH'], sha1(url.encode('utf-8')).hexdigest())
+
+
+def artcache_get(url):
+    """returns cached (background, palette, validators) of url or None, memory first, then disk"""
+    with ARTCACHE_DICT['LOCK']:
+        if url in ARTCACHE_DICT['ENTRIES']:
+            ARTCACHE_DICT['ENTRIES'].move_to_end(url)
+            img, palette, size, validators = ARTCACHE_DICT['ENTRIES'][url]
+            return img, palette, validators
+    if ARTCACHE_DICT['PATH'] is None:
+        return None
+    filename = artcache_file(url)
+    try:
+        with open(filename + '.json', 'r') as mypalettefile:
+            palette = json.load(mypalettefile)
+        img = Image.open(filename + '.png')
+        img.load()
+        os.utime(filename + '.png')  # mtime is used as lru order of the disk tier
+    except (ValueError, OSError):
+        return None
+    validators = palette.pop('VALIDATORS', None)
+    palette = dict((k, tuple(v) if isinstance(v, list) else v) for k, v in palette.items())
+    artcache_put(url, (img, palette), False, validators)
+    return img, palette, validators
+
+
+def artcache_put(url, entry, disk=True, validators=None):
+    """stores (background, palette) and the http validators of url in memory and optional on disk, evicts least recently used entries"""
+    img, palette = entry
+    size = img.size[0] * img.size[1] * len(img.getbands())
+    with ARTCACHE_DICT['LOCK']:
+        if url in ARTCACHE_DICT['ENTRIES']:
+            ARTCACHE_DICT['BYTES'] -= ARTCACHE_DICT['ENTRIES'].pop(url)[2]
+        ARTCACHE_DICT['ENTRIES'][url] = (img, palette, size, validators)
+        ARTCACHE_DICT['BYTES'] += size
+        while len(ARTCACHE_DICT['ENTRIES']) > 1 and (len(ARTCACHE_DICT['ENTRIES']) > ARTCACHE_DICT['MAX_ENTRIES'] or ARTCACHE_DICT['BYTES'] > ARTCACHE_DICT['MAX_BYTES']):
+            ARTCACHE_DICT['BYTES'] -= ARTCACHE_DICT['ENTRIES'].popitem(last=False)[1][2]
+    if disk and ARTCACHE_DICT['PATH'] is not None:
+        try:
+            os.makedirs(ARTCACHE_DICT['PATH'], exist_ok=True)  # on the first write, not when display.py is imported
+        except OSError as e:
+            print('ERROR at artcache, using memory only:', e)
+            ARTCACHE_DICT['PATH'] = None
+            return
+        filename = artcache_file(url)
+        try:
+            img.save(filename + '.tmp', 'PNG', compress_level=1)
+            os.replace(filename + '.tmp', filename + '.png')
+            with open(filename + '.tmp', 'w') as mypalettefile:
+                json.dump(dict(palette, VALIDATORS=validators), mypalettefile)
+            os.replace(filename + '.tmp', filename + '.json')
+            artcache_evict_disk()
+        except OSError as e:
+            print('ERROR at artcache:', e)
+
+
+def artcache_evict_disk():
+    """removes least recently used entries of the disk tier until entry count and size are within limits"""
+    files = []
+    for name in os.listdir(ARTCACHE_DICT['PATH']):
+        if name.endswith('.png'):
+            stat = os.stat(os.path.join(ARTCACHE_DICT['PATH'], name))
+            files.append((stat.st_mtime, stat.st_size, name[:-4]))
+    files.sort()
+    total = sum(f[1] for f in files)
+    while files and (len(files) > ARTCACHE_DICT['DISK_MAX_ENTRIES'] or total > ARTCACHE_DICT['DISK_MAX_BYTES']):
+        mtime, size, name = files.pop(0)
+        total -= size
+        for ext in ('.png', '.json'):
+            try:
+                os.remove(os.path.join(ARTCACHE_DICT['PATH'], name + ext))
+            except OSError:
+                pass
+
+
+def art_get(url, timeout=None):
+    """returns (background, palette) of normalized albumart url, fetched only if not cached,
+    None if the fetch takes longer than timeout seconds"""
+    entry = artcache_get(url)
+    if entry is None and aio_failed(url):  # the asyncio runtime could not fetch it, do not block the handler
+        return IMAGE_DICT['BG_DEFAULT'], art_palette(IMAGE_DICT['BG_DEFAULT'])
+    if entry is not None:
+        validators = entry[2]
+        if ARTFETCH_DICT['REVALIDATE'] and validators and (validators.get('ETAG') or validators.get('MODIFIED')) and time() > validators.get('CHECKED', 0) + ARTFETCH_DICT['REVALIDATE']:
+            art_start(url, validators)  # conditional request in the background, cached art is shown meanwhile
+        return entry[:2]
+    event = art_start(url, None)
+    if not event.wait(timeout):
+        return None
+    entry = artcache_get(url)
+    if entry is None:  # not displayable images are not cached, use default background
+        return IMAGE_DICT['BG_DEFAULT'], art_palette(IMAGE_DICT['BG_DEFAULT'])
+    return entry[:2]
+
+
+def art_start(url, validators):
+    """starts a fetch thread for url, returns its Event, every url is fetched only once at a time"""
+    with ARTCACHE_DICT['LOCK']:  # even if prefetch and pushstate ask at the same time
+        event = ARTCACHE_DICT['INFLIGHT'].get(url)
+        if event is not None:
+            return event
+        event = ARTCACHE_DICT['INFLIGHT'][url] = Event()
+    thread = Thread(target=art_load, args=(url, validators, event))
+    thread.daemon = True
+    thread.start()
+    return event
+
+
+def art_load(url, validators, event):
+    """fetch thread of art_start, caches the albumart and swaps it in if it belongs to the current track"""
+    import requests
+    try:
+        entry, validators = art_process(url, validators)
+        if entry is not None:
+            artcache_put(url, entry, validators=validators)
+        elif validators is not None:  # unchanged, remember when it was checked
+            cached = artcache_get(url)
+            if cached is not None:
+                artcache_put(url, cached[:2], validators=validators)
+    except requests.RequestException as e:
+        print('ERROR at albumart:', url, e)
+    finally:
+        with ARTCACHE_DICT['LOCK']:
+            del ARTCACHE_DICT['INFLIGHT'][url]
+        event.set()
+    art_swap(url)
+
+
+def art_swap(url):
+    """shows albumart that arrived after on_push_state fell back to the default background, or that changed on the server"""
+    entry = artcache_get(url)
+    if url != ARTFETCH_DICT['CURRENT'] or entry is None or entry[0] is IMAGE_DICT['IMG2']:
+        return
+    IMAGE_DICT['IMG2'], palette = entry[:2]
+    OVERLAY_DICT.update(palette)
+    if VOLUMIO_DICT['MODE'] == 'player':
+        render_player()
+
+
+def prefetch_schedule():
+    """orders the albumart of the queue entries around the current position for prefetching"""
+    urls = []
+    tracks = QUEUE_DICT['TRACKS']
+    if tracks and VOLUMIO_DICT['POSITION'] is not None:
+        current = art_url(tracks[VOLUMIO_DICT['POSITION'] % len(tracks)][2])
+        offsets = list(range(1, PREFETCH_DICT['COUNT'] + 1))
+        offsets.insert(1, -1)  # next entry first, then the previous one, queue loops like prevnext()
+        for offset in offsets[:PREFETCH_DICT['COUNT']]:
+            url = art_url(tracks[(VOLUMIO_DICT['POSITION'] + offset) % len(tracks)][2])
+            if url != current and url not in urls:
+                urls.append(url)
+    PREFETCH_DICT['URLS'] = urls
+    PREFETCH_DICT['EVENT'].set()
+
+
+def prefetch_helper():
+    """helper function as thread, warms the albumart cache in the order of prefetch_schedule()"""
+    while True:
+        PREFETCH_DICT['EVENT'].wait()
+        PREFETCH_DICT['EVENT'].clear()
+        for url in PREFETCH_DICT['URLS']:
+            if PREFETCH_DICT['EVENT'].is_set():  # position changed, start over with the new order
+                break
+            art_get(url)
+
+
+def remaining_time(duration, seek):
+    """remaining time of track as -MM:SS, minutes are not wrapped at one hour"""
+    # v0.0.4 show remaining time of track
+    remaining = gmtime(duration - int(float(seek)/1000))
+    hour = strftime("%-H", remaining)
+    if hour == '0':
+        return ''.join(['-', strftime("%M:%S", remaining)])
+    minute = str((int(hour)*60) + int(strftime("%-M", remaining)))
+    return ''.join(['-', minute, ':', strftime("%S", remaining)])
+
+
+def player_static():
+    """rebuilds the static layer of the player screen if title, albumart or status changed"""
+    key = (VOLUMIO_DICT['ARTIST'], VOLUMIO_DICT['ALBUM'], VOLUMIO_DICT['TITLE'], VOLUMIO_DICT['STATUS'], OVERLAY_DICT['TXT_COL'], OVERLAY_DICT['STR_COL'])
+    if key == LAYER_DICT['STATIC_KEY'] and IMAGE_DICT['IMG2'] is LAYER_DICT['STATIC_BG']:
+        return
+
+    def f_drawtext(x, y, text, fontstring, fillstring):
+        """draw text"""
+        text_draw(draw, (x, y), text, fontstring, fillstring)
+
+    def f_x1(textwidth):
+        """helper textwidth"""
+        if textwidth <= IMAGE_DICT['WIDTH']:
+            x1 = (IMAGE_DICT['WIDTH'] - textwidth)//2
+        else:
+            x1 = 0
+        return x1
+
+    def f_content(text, fontsize, top, shadowoffset=1, bottom=None):
+        """draw content, text wider than the display becomes a marquee"""
+        if text is not None:
+            width, height = text_size(text, fontsize)
+            x1 = f_x1(width)
+            f_drawtext(x1 + shadowoffset, top + shadowoffset, text, fontsize, OVERLAY_DICT['STR_COL'])  # shadow
+            f_drawtext(x1, top, text, fontsize, OVERLAY_DICT['TXT_COL'])
+            if width > IMAGE_DICT['WIDTH'] and MARQUEE_DICT['FPS'] > 0:
+                box = (0, top, IMAGE_DICT['WIDTH'], min(top + height + shadowoffset, bottom or IMAGE_DICT['HEIGHT']))  # not into the next text
+                marquees.append({"KIND": 'player', "TEXT": text, "FONT": fontsize, "SHADOW": shadowoffset, "BOX": box, "START": monotonic(), "OFFSET": 0})
+
+    LAYER_DICT['BASE'] = IMAGE_DICT['IMG2'].copy()
+    if VOLUMIO_DICT['STATUS'] == 'play':
+        icon_draw(LAYER_DICT['BASE'], (4, 53), 'PAUSE', OVERLAY_DICT['TXT_COL'])
+    else:
+        icon_draw(LAYER_DICT['BASE'], (4, 53), 'PLAY', OVERLAY_DICT['TXT_COL'])
+    icon_draw(LAYER_DICT['BASE'], (210, 53), 'MENU', OVERLAY_DICT['TXT_COL'])
+    icon_draw(LAYER_DICT['BASE'], (210, 174), 'VOLUME', OVERLAY_DICT['TXT_COL'])
+    LAYER_DICT['STATIC'] = LAYER_DICT['BASE'].copy()
+    draw = ImageDraw.Draw(LAYER_DICT['STATIC'], 'RGBA')
+
+    # text
+    marquees = []
+    f_content(VOLUMIO_DICT['ARTIST'], FONT_DICT['FONT_M'], 7, 2, 35)
+    f_content(VOLUMIO_DICT['ALBUM'], FONT_DICT['FONT_M'], 35, 2, 105)
+    f_content(VOLUMIO_DICT['TITLE'], FONT_DICT['FONT_L'], 105, 2, LAYER_DICT['VOLUME_BOX'][1])
+    LAYER_DICT['MARQUEES'] = marquees
+
+    LAYER_DICT['STATIC_KEY'], LAYER_DICT['STATIC_BG'] = key, IMAGE_DICT['IMG2']
+    LAYER_DICT['FRAME'] = LAYER_DICT['STATIC'].copy()
+    LAYER_DICT['VOLUME_KEY'], LAYER_DICT['TIME_KEY'] = None, None  # dynamic layers have to be pasted again
+
+
+def player_layer(name, key, paint):
+    """repaints the box of a dynamic layer on a crop of the static layer and pastes it into the frame, if key changed"""
+    if key == LAYER_DICT[name + '_KEY']:
+        return
+    box = LAYER_DICT[name + '_BOX']
+    layer = LAYER_DICT['STATIC'].crop(box)
+    paint(ImageDraw.Draw(layer, 'RGBA'), box[0], box[1])
+    LAYER_DICT['FRAME'].paste(layer, box[:2])
+    LAYER_DICT[name + '_KEY'] = key
+
+
+def paint_volume(draw, left, top):
+    """volumebar, coordinates relative to the layer box"""
+    draw.rectangle((5 - left, 184 - top, IMAGE_DICT['WIDTH'] - 34 - left, 184 + 8 - top), OVERLAY_DICT['BAR_BGCOL'])  # background
+    end = int((float(VOLUMIO_DICT['VOLUME'])/100)*(IMAGE_DICT['WIDTH'] - 33))
+    if end > 5:  # pillow >= 9.5 refuses boxes with x1 < x0, volume 0 has no foreground
+        draw.rectangle((5 - left, 184 - top, end - left, 184 + 8 - top), OVERLAY_DICT['BAR_COL'])  # foreground
+
+
+def paint_time(draw, left, top):
+    """timebar and remaining time, coordinates relative to the layer box"""
+    if not VOLUMIO_DICT['TIMEBAR']:
+        return
+    draw.rectangle((5 - left, 230 - top, IMAGE_DICT['WIDTH'] - 5 - left, 230 + 8 - top), OVERLAY_DICT['BAR_BGCOL'])  # background
+    end = timebar_width()
+    if end > 5:  # seek 0 has no foreground
+        draw.rectangle((5 - left, 230 - top, end - left, 230 + 8 - top), OVERLAY_DICT['BAR_COL'])
+    remaining = remaining_time(VOLUMIO_DICT['DURATION'], VOLUMIO_DICT['SEEK'])
+    w4 = text_size(remaining, FONT_DICT['FONT_M'])[0]
+    text_draw(draw, (IMAGE_DICT['WIDTH'] - w4 - 2 + 2 - left, 206 - 2 + 2 - top), remaining, FONT_DICT['FONT_M'], OVERLAY_DICT['STR_COL'])  # shadow, fill by mean
+    text_draw(draw, (IMAGE_DICT['WIDTH'] - w4 - 2 - left, 206 - 2 - top), remaining, FONT_DICT['FONT_M'], OVERLAY_DICT['TXT_COL'])  # fill by mean
+
+
+def timebar_width():
+    """right end of the timebar"""
+    return int((float(int(float(VOLUMIO_DICT['SEEK'])/1000))/float(int(float(VOLUMIO_DICT['DURATION']))))*(IMAGE_DICT['WIDTH']-10))
+
+
+def render_player():
+    """composes the player screen from the cached static layer and the dynamic volume and time layers"""
+    if render_defer(render_player):
+        return
+    with IMAGE_DICT['LOCK']:
+        player_static()
+        palette = (OVERLAY_DICT['BAR_BGCOL'], OVERLAY_DICT['BAR_COL'])
+        player_layer('VOLUME', (VOLUMIO_DICT['VOLUME'], palette), paint_volume)
+        if VOLUMIO_DICT['TIMEBAR']:
+            player_layer('TIME', (remaining_time(VOLUMIO_DICT['DURATION'], VOLUMIO_DICT['SEEK']), timebar_width(), palette), paint_time)
+        else:
+            player_layer('TIME', None, paint_time)
+        if MARQUEE_DICT['ACTIVE'] is not LAYER_DICT['MARQUEES']:  # keep scrolling, unless the screen was left or the texts changed
+            marquee_set(LAYER_DICT['MARQUEES'])
+        sendtodisplay(LAYER_DICT['FRAME'])
+
+
+def backlight(value):
+    """switches the backlight, marquees pause while it is off"""
+    IMAGE_DICT['BACKLIGHT'] = value
+    DISP.set_backlight(value)
+    if value and MARQUEE_DICT['ACTIVE']:
+        MARQUEE_DICT['EVENT'].set()
+
+
+def marquee_set(marquees):
+    """makes marquees the scrolling texts of the screen shown"""
+    MARQUEE_DICT['ACTIVE'] = marquees
+    if marquees:
+        MARQUEE_DICT['EVENT'].set()
+
+
+def marquee_strip(text, font):
+    """off-screen mask of text, rendered once: the text, a gap and the text again, so every window of the display width can be cropped from it"""
+    key = (text, font.path, font.size)
+    if key in MARQUEE_DICT['STRIPS']:
+        MARQUEE_DICT['STRIPS'].move_to_end(key)
+        return MARQUEE_DICT['STRIPS'][key]
+    width, height = text_size(text, font)
+    mask = Image.new('L', (width, max(height, 1)), 0)
+    ImageDraw.Draw(mask).text((0, 0), text, font=font, fill=255)
+    strip = Image.new('L', (width + MARQUEE_DICT['GAP'] + IMAGE_DICT['WIDTH'], mask.size[1]), 0)
+    strip.paste(mask, (0, 0))
+    strip.paste(mask, (width + MARQUEE_DICT['GAP'], 0))
+    MARQUEE_DICT['STRIPS'][key] = (strip, width + MARQUEE_DICT['GAP'])
+    while len(MARQUEE_DICT['STRIPS']) > MARQUEE_DICT['MAX_STRIPS']:
+        MARQUEE_DICT['STRIPS'].popitem(last=False)
+    return MARQUEE_DICT['STRIPS'][key]
+
+
+def marquee_frame():
+    """moves the marquees of the screen shown, only their rows get repainted and sent, on the marquee thread"""
+    with IMAGE_DICT['LOCK']:
+        marquees, now, regions = MARQUEE_DICT['ACTIVE'], monotonic(), []
+        for marquee in marquees:
+            if marquee['KIND'] == 'player' and (VOLUMIO_DICT['MODE'] != 'player' or marquees is not LAYER_DICT['MARQUEES']):
+                return  # screen changed meanwhile
+            if marquee['KIND'] == 'row' and (PAGE_DICT['PAGE'] is not marquee['PAGE'] or PAGE_DICT['MARKED'] != marquee['ROW']):
+                return
+            strip, period = marquee_strip(marquee['TEXT'], marquee['FONT'])
+            # the offset follows the clock, so late frames dont slow the scrolling down
+            offset = int(max((now - marquee['START']) % (MARQUEE_DICT['PAUSE'] + period / MARQUEE_DICT['SPEED']) - MARQUEE_DICT['PAUSE'], 0) * MARQUEE_DICT['SPEED'])
+            if offset == marquee['OFFSET']:
+                continue
+            marquee['OFFSET'] = offset
+            window = strip.crop((offset, 0, offset + IMAGE_DICT['WIDTH'], strip.size[1]))
+            box = marquee['BOX']
+            if marquee['KIND'] == 'player':
+                layer = LAYER_DICT['BASE'].crop(box)
+                draw = ImageDraw.Draw(layer, 'RGBA')
+                draw.bitmap((marquee['SHADOW'], marquee['SHADOW']), window, fill=OVERLAY_DICT['STR_COL'])  # shadow
+                draw.bitmap((0, 0), window, fill=OVERLAY_DICT['TXT_COL'])
+                LAYER_DICT['STATIC'].paste(layer, box[:2])
+                LAYER_DICT['FRAME'].paste(layer, box[:2])
+                image = LAYER_DICT['FRAME']
+            else:
+                page_paint(IMAGE_DICT['IMG3'], box, marquee['PAGE'], marquee['ROW'], window)
+                image = IMAGE_DICT['IMG3']
+            regions.append(box)
+        if regions:
+            sendtodisplay(image, regions, 'marquee_spi')
+
+
+def marquee_helper():
+    """helper function as thread, ticks the marquees with a steady frame rate while there are some"""
+    while True:
+        MARQUEE_DICT['EVENT'].wait()
+        MARQUEE_DICT['EVENT'].clear()
+        due = monotonic()
+        while MARQUEE_DICT['ACTIVE'] and MARQUEE_DICT['FPS'] > 0 and IMAGE_DICT['BACKLIGHT']:  # nothing to see in the dark
+            due += 1.0 / MARQUEE_DICT['FPS']
+            delay = due - monotonic()
+            if delay > 0:
+                sleep(delay)
+            else:  # behind, skip the missed frames instead of catching up
+                due = monotonic()
+            with RENDER_DICT['COND']:
+                if RENDER_DICT['PENDING'] is not None or RENDER_DICT['BUSY']:  # real renders first, they are newer anyway
+                    continue
+            # drawn here, not by the render worker, so its counters and spans stay those of real renders
+            start = trace_start()
+            marquee_frame()
+            trace_span('marquee', start)
+
+
+def clock_sync(seek, status):
+    """anchors the local playback clock on seek (ms) and status of a pushstate"""
+    if CLOCK_DICT['PLAYING']:
+        CLOCK_DICT['DRIFT'] = clock_seek() - seek
+    CLOCK_DICT['SEEK'], CLOCK_DICT['ANCHOR'] = seek, monotonic()
+    CLOCK_DICT['PLAYING'] = status == 'play'
+
+
+def clock_seek():
+    """extrapolated seek (ms) of the local playback clock"""
+    if not CLOCK_DICT['PLAYING']:
+        return CLOCK_DICT['SEEK']
+    return CLOCK_DICT['SEEK'] + int((monotonic() - CLOCK_DICT['ANCHOR']) * 1000)
+
+
 def on_push_state(*args):
     """processes websocket informations of push state"""
     # start_time = time()  # debug, time of code execution
     global IMAGE_DICT, OVERLAY_DICT, VOLUMIO_DICT
     # WS_CONNECTED = True
+    start = trace_start()
+    trace_reply('state')
+    updatedb = bool(args[0].get('updatedb'))
+    if BROWSE_DICT['UPDATEDB'] and not updatedb:  # library rescan finished, in every mode
+        browse_invalidate()
+    BROWSE_DICT['UPDATEDB'] = updatedb
     # test to get rid of unneeded, empty screen refreshs
-    if not args[0]['title'] and not args[0]['artist'] and not args[0]['album'] and LEN_QUEUE > 0:
+    if not args[0]['title'] and not args[0]['artist'] and not args[0]['album'] and QUEUE_DICT['TRACKS']:
+        trace_end()
         return
 
     #check to not process multiple identical getstates
@@ -386,148 +1611,54 @@ def on_push_state(*args):
         skip = False
 
 
-    def f_textsize(text, fontsize):
-        """"helper textsize"""
-        w1, y1 = draw.textsize(text, fontsize)
-        return w1
-
-    def f_drawtext(x, y, text, fontstring, fillstring):
-        """draw text"""
-        draw.text((x, y), text, font=fontstring, fill=fillstring)
-
-    def f_x1(textwidth):
-        """helper textwidth"""
-        if textwidth <= IMAGE_DICT['WIDTH']:
-            x1 = (IMAGE_DICT['WIDTH'] - textwidth)//2
-        else:
-            x1 = 0
-        return x1
-
-    def f_content(field, fontsize, top, shadowoffset=1):
-        """draw content"""
-        if field in args[0]:
-            if args[0][field] is not None:
-                w1 = f_textsize(args[0][field], fontsize)
-                x1 = f_x1(w1)
-                f_drawtext(x1 + shadowoffset, top + shadowoffset, args[0][field], fontsize, OVERLAY_DICT['STR_COL'])  # shadow
-                f_drawtext(x1, top, args[0][field], fontsize, OVERLAY_DICT['TXT_COL'])
-
     def f_background(albumurl):
         """helper background"""
         global VOLUMIO_DICT, IMAGE_DICT, OVERLAY_DICT
-        if albumurl == VOLUMIO_DICT['ALBUMART']:
-            IMAGE_DICT['IMG'] = IMAGE_DICT['IMG2'].copy()
-        else:
+        if albumurl != VOLUMIO_DICT['ALBUMART']:
             VOLUMIO_DICT['ALBUMART'] = albumurl
-            albumart2 = albumurl
-            if not albumart2:  # v0.0.7 hint pylint
-                albumart2 = 'http://localhost:3000/albumart'
-            if 'http' not in albumart2:
-                albumart2 = ''.join(['http://localhost:3000', VOLUMIO_DICT['ALBUMART']])
-            response = requests.get(albumart2)
-            try:  # to catch not displayable images
-                IMAGE_DICT['IMG'] = Image.open(BytesIO(response.content)).convert('RGBA')  # v.0.04 gab bei spotify probleme
-                IMAGE_DICT['IMG'] = IMAGE_DICT['IMG'].resize((IMAGE_DICT['WIDTH'], IMAGE_DICT['HEIGHT']))
-                IMAGE_DICT['IMG'] = IMAGE_DICT['IMG'].filter(ImageFilter.BLUR)  # Blur
-            except (ValueError, RuntimeError) as e:
-                IMAGE_DICT['IMG'] = IMAGE_DICT['BG_DEFAULT'].copy()
-
-            IMAGE_DICT['IMG2'] = IMAGE_DICT['IMG'].copy()
-            f_textcontrast(IMAGE_DICT['IMG'])  # to get the right values in TXT_COL, STR_COL, BAR_BGCOL, BAR_COL, DARK
-        return IMAGE_DICT['IMG']
-
-    def f_textcontrast(image):
-        """helper contrast"""
-        global OVERLAY_DICT
-        im_stat = ImageStat.Stat(image)
-        im_mean = im_stat.mean
-        mn = mean(im_mean)
-        OVERLAY_DICT['TXT_COL'] = (255, 255, 255)
-        OVERLAY_DICT['STR_COL'] = (15, 15, 15)
-        OVERLAY_DICT['BAR_BGCOL'] = (200, 200, 200)
-        OVERLAY_DICT['BAR_COL'] = (255, 255, 255)
-        OVERLAY_DICT['DARK'] = False
-        if mn > 175:
-            OVERLAY_DICT['TXT_COL'] = (55, 55, 55)
-            OVERLAY_DICT['STR_COL'] = (200, 200, 200)  # v0.0.4 needed for shadow
-            OVERLAY_DICT['DARK'] = True
-            OVERLAY_DICT['BAR_BGCOL'] = (255, 255, 255)
-            OVERLAY_DICT['BAR_COL'] = (100, 100, 100)
-        if mn < 80:
-            OVERLAY_DICT['TXT_COL'] = (200, 200, 200)
-
-    def f_displayoverlay(varstatus):
-        """displayoverlay"""
-        if varstatus == 'play':
-            f_drawtext(4, 53, u"\uf04C", FONT_DICT['FONT_FAS'], OVERLAY_DICT['TXT_COL'])
-        else:
-            f_drawtext(4, 53, u"\uf04b", FONT_DICT['FONT_FAS'], OVERLAY_DICT['TXT_COL'])
-        f_drawtext(210, 53, u"\uf0c9", FONT_DICT['FONT_FAS'], OVERLAY_DICT['TXT_COL'])
-        f_drawtext(210, 174, u"\uf028", FONT_DICT['FONT_FAS'], OVERLAY_DICT['TXT_COL'])
-
-        # text
-        f_content('artist', FONT_DICT['FONT_M'], 7, 2)
-        f_content('album', FONT_DICT['FONT_M'], 35, 2)
-        f_content('title', FONT_DICT['FONT_L'], 105, 2)
-
-        # volumebar
-        draw.rectangle((5, 184, IMAGE_DICT['WIDTH']-34, 184 + 8), OVERLAY_DICT['BAR_BGCOL'])  # background
-        draw.rectangle((5, 184, int((float(VOLUMIO_DICT['VOLUME'])/100)*(IMAGE_DICT['WIDTH'] - 33)), 184 + 8), OVERLAY_DICT['BAR_COL'])  # foreground
+            ARTFETCH_DICT['CURRENT'] = art_url(albumurl)
+            entry = art_get(ARTFETCH_DICT['CURRENT'], ARTFETCH_DICT['WAIT'])
+            if entry is None:  # slow albumart server, show the default background now, art_swap() shows the albumart later
+                entry = IMAGE_DICT['BG_DEFAULT'], art_palette(IMAGE_DICT['BG_DEFAULT'])
+            IMAGE_DICT['IMG2'], palette = entry  # IMG2 is shared with the albumart cache, draw only on copies
+            OVERLAY_DICT.update(palette)  # to get the right values in TXT_COL, STR_COL, BAR_BGCOL, BAR_COL, DARK
 
     def f_timebar(args):
         """helper timebar"""
         global VOLUMIO_DICT
+        VOLUMIO_DICT['TIMEBAR'] = False
         if 'duration' in args[0]:
             VOLUMIO_DICT['DURATION'] = args[0]['duration']  # seconds
             if VOLUMIO_DICT['DURATION'] != 0:
                 if 'seek' in args[0] and args[0]['seek'] is not None:
                     VOLUMIO_DICT['SEEK'] = args[0]['seek']  # time elapsed seconds
-                    draw.rectangle((5, 230, IMAGE_DICT['WIDTH']-5, 230 + 8), OVERLAY_DICT['BAR_BGCOL'])  # background
-                    draw.rectangle((5, 230, int((float(int(float(args[0]['seek'])/1000))/float(int(float(args[0]['duration']))))*(IMAGE_DICT['WIDTH']-10)), 230 + 8), OVERLAY_DICT['BAR_COL'])
-
-                    # v0.0.4 show remaining time of track
-                    # print('a;',strftime("%H:%M:%S", gmtime(DURATION - int(float(SEEK)/1000))))
-                    # print('B;',strftime("%-H", gmtime(DURATION - int(float(SEEK)/1000))))
-                    hour = strftime("%-H", gmtime(VOLUMIO_DICT['DURATION'] - int(float(VOLUMIO_DICT['SEEK'])/1000)))
-                    if hour == '0':
-                        remaining = ''.join(['-', strftime("%M:%S", gmtime(VOLUMIO_DICT['DURATION'] - int(float(VOLUMIO_DICT['SEEK'])/1000)))])
-                    else:
-                        minute = strftime("%-M", gmtime(VOLUMIO_DICT['DURATION'] - int(float(VOLUMIO_DICT['SEEK'])/1000)))
-                        minute = str((int(hour)*60) + int(minute))
-                        remaining = ''.join(['-', minute, ':', strftime("%S", gmtime(VOLUMIO_DICT['DURATION'] - int(float(VOLUMIO_DICT['SEEK'])/1000)))])
-                    # print('remaining:', remaining)
-
-                    #remaining = ''.join(['-', strftime("%M:%S", gmtime(DURATION - int(float(SEEK)/1000)))])
-                    w4 = f_textsize(remaining, FONT_DICT['FONT_M'])
-                    f_drawtext(IMAGE_DICT['WIDTH'] - w4 - 2 + 2, 206 - 2 + 2, remaining, FONT_DICT['FONT_M'], OVERLAY_DICT['STR_COL'])  # shadow, fill by mean
-                    f_drawtext(IMAGE_DICT['WIDTH'] - w4 - 2, 206 - 2, remaining, FONT_DICT['FONT_M'], OVERLAY_DICT['TXT_COL'])  # fill by mean
+                    VOLUMIO_DICT['TIMEBAR'] = True
+                    clock_sync(VOLUMIO_DICT['SEEK'], args[0]['status'])
 
     if VOLUMIO_DICT['MODE'] == 'player' and not skip:
         VOLUMIO_DICT['VOLUME'] = int(args[0]['volume'])
-        if 'position' in args[0]:
+        if 'position' in args[0] and args[0]['position'] != VOLUMIO_DICT['POSITION']:
             VOLUMIO_DICT['POSITION'] = args[0]['position']  # v.0.0.7 as some music service dont push position
+            prefetch_schedule()
         VOLUMIO_DICT['STATUS'] = args[0]['status']  # v0.0.6
         VOLUMIO_DICT['SERVICE'] = args[0]['service']  # v0.0.6
-        IMAGE_DICT['IMG'] = f_background(args[0]['albumart'].encode('ascii', 'ignore').decode('utf-8'))
-        draw = ImageDraw.Draw(IMAGE_DICT['IMG'], 'RGBA')
-
-        f_displayoverlay(VOLUMIO_DICT['STATUS'])
+        VOLUMIO_DICT['ARTIST'] = args[0].get('artist')
+        VOLUMIO_DICT['ALBUM'] = args[0].get('album')
+        VOLUMIO_DICT['TITLE'] = args[0].get('title')
+        f_background(args[0]['albumart'].encode('ascii', 'ignore').decode('utf-8'))
         f_timebar(args)
-
-        # display only if img changed
-        if IMAGE_DICT['IMG_CHECK'] != IMAGE_DICT['IMG']:
-            IMAGE_DICT['IMG_CHECK'] = IMAGE_DICT['IMG']
-            sendtodisplay(IMAGE_DICT['IMG'])
+        render_player()  # only changed layers get repainted, only changed rectangles get sent
+        trace_span('state', start)
+    trace_end()
     # print("on_push_state--- %s seconds ---" % (time() - start_time))  # debug, time of code execution
 
 
 # IMG = Image.new('RGBA', (240, 240), color=(0, 0, 0, 25))  # v.0.0.7 not needed, as we always open an image
 # draw = ImageDraw.Draw(IMG, 'RGBA') v.0.0.7
-SOCKETIO.once('connect', on_connect)
-SOCKETIO.on('disconnect', on_disconnect)
 
 
 def handle_button(pin):
+    start = trace_begin('button')
     if pin == 5:
         button_a(VOLUMIO_DICT['MODE'], VOLUMIO_DICT['STATUS'])
     if pin == 6:
@@ -536,6 +1667,10 @@ def handle_button(pin):
         button_x(VOLUMIO_DICT['MODE'], VOLUMIO_DICT['STATUS'])
     if pin == BUTTONS[3]:
         button_y(VOLUMIO_DICT['MODE'], VOLUMIO_DICT['STATUS'])
+    trace_emitted()
+    if start is not None:
+        trace_span('button', start[2])
+    trace_end()
 
 
 def button_a(mode, status):  # optimieren, VOLUMIO_DICT['MODE'] durch mode (lokale variable) ersetzen
@@ -588,7 +1723,9 @@ def button_a(mode, status):  # optimieren, VOLUMIO_DICT['MODE'] durch mode (loka
                 # replace "mnt/" in uri through "music-library/", otherwise calling them dont work
                 uri = NAV_ARRAY_URI[NAV_DICT['MARKER']]
                 uri = uri.replace('mnt/', 'music-library/')
-                SOCKETIO.emit('browseLibrary', {'uri': uri})
+                if BROWSE_DICT['CURRENT'] is not None:  # way back to this level
+                    BROWSE_DICT['HISTORY'].append((BROWSE_DICT['CURRENT'], NAV_DICT['MARKER'], NAV_DICT['LISTSTART']))
+                browse_open(uri)
                 browselibrary = False
             else:
                 display_stuff(IMAGE_DICT['BG_DEFAULT'], OBJ_TRANS['DISPLAY']['NOTSUPPORTED'], NAV_DICT['MARKER'], NAV_DICT['LISTSTART'])
@@ -602,7 +1739,7 @@ def button_a(mode, status):  # optimieren, VOLUMIO_DICT['MODE'] durch mode (loka
                 SOCKETIO.emit(NAV_ARRAY_URI[NAV_DICT['MARKER']][0], NAV_ARRAY_URI[NAV_DICT['MARKER']][1])
                 display_stuff(IMAGE_DICT['BG_DEFAULT'], OBJ_TRANS['DISPLAY']['SETSLEEPTIMER'], 0, 0, 'info')
                 sleep(2)
-                DISP.set_backlight(False)
+                backlight(False)
                 reset_variable('player')
             else:
                 SOCKETIO.emit(NAV_ARRAY_URI[NAV_DICT['MARKER']])
@@ -615,14 +1752,13 @@ def button_a(mode, status):  # optimieren, VOLUMIO_DICT['MODE'] durch mode (loka
             return
         #elif NAV_ARRAY_TYPE[NAV_DICT['MARKER']] == 'prevnext':  # v.0.0.4
         if NAV_ARRAY_TYPE[NAV_DICT['MARKER']] == 'prevnext':  # v.0.0.4
-            SOCKETIO.emit('getQueue', on_push_queue)  # refresh variables of queue
             VOLUMIO_DICT['MODE'] = 'prevnext'  # optimieren wg. global bzw. wird das überhaupt benötigt
-            display_stuff(IMAGE_DICT['BG_DEFAULT'], [''.join([str(VOLUMIO_DICT['POSITION'] + 1), '/', str(LEN_QUEUE)]), OBJ_TRANS['DISPLAY']['PREVNEXT'], TITLE_QUEUE[VOLUMIO_DICT['POSITION']]], 1, 0, 'seek')
+            display_stuff(IMAGE_DICT['BG_DEFAULT'], prevnext_text(), 1, 0, 'seek')  # queue model is kept up to date by pushQueue
             return
         # only get called if no return before was executed
         #else:  # browsesource
         reset_variable('navigation')
-        SOCKETIO.emit('getBrowseSources', '', on_push_browsesources)
+        browse_open('')
     #else:
     if mode not in ['player', 'navigation', 'menu']:
         reset_variable('player')
@@ -632,9 +1768,9 @@ def button_a(mode, status):  # optimieren, VOLUMIO_DICT['MODE'] durch mode (loka
 def button_b(mode, status):  # optimieren, VOLUMIO_DICT['MODE'] durch mode (lokale variable) ersetzen
     #print('button_b, mode:', mode, 'pin:', pin)
     if mode == 'player':
-        while not GPIO.input(6) and VOLUMIO_DICT['VOLUME'] > 0:  # limit/exit at volume 0 so amixer dont go crazy
-            SOCKETIO.emit('volume', '-')
-            sleep(0.5)
+        repeat_start(6, volume_step, ('-',), 'VOLUME')
+    elif mode == 'navigation' and browse_back():  # one level up, from cache if possible
+        return
     elif mode in ['navigation', 'menu', 'seek', 'prevnext']:
         reset_variable('player')
         IMAGE_DICT['LASTREFRESH'] = time()-5  # to get display refresh independ from refresh thread
@@ -645,19 +1781,11 @@ def button_x(mode, status):  # optimieren, VOLUMIO_DICT['MODE'] durch mode (loka
     #print('button_x, mode:', mode, 'pin:', pin)
     if mode == 'player':
         navigation_handler()
-        DISP.set_backlight(True)  # v.0.0.4
+        backlight(True)  # v.0.0.4
     elif mode in ['navigation', 'menu']:  # v.0.0.7 hint pylint
-        while not GPIO.input(16):
-            NAV_DICT['MARKER'] -= 1  # count minus 1
-            if NAV_DICT['MARKER'] < 0:  # blaettere nach oben durch
-                NAV_DICT['MARKER'] = NAV_DICT['LISTRESULT'] - 1
-                if NAV_DICT['LISTRESULT'] > NAV_DICT['LISTMAX'] - 1:  # dann aendere auch noch den liststart
-                    NAV_DICT['LISTSTART'] = int(NAV_DICT['LISTSTART'] + (floor(NAV_DICT['LISTRESULT']/NAV_DICT['LISTMAX'])*NAV_DICT['LISTMAX']))
-            NAV_DICT['LISTSTART'] = int(floor(NAV_DICT['MARKER']/NAV_DICT['LISTMAX'])*NAV_DICT['LISTMAX'])  # definiert das blaettern zur naechsten Seite
-            display_stuff(IMAGE_DICT['BG_DEFAULT'], NAV_ARRAY_NAME, NAV_DICT['MARKER'], NAV_DICT['LISTSTART'])
-            sleep(0.1)  # v.0.0.7
+        scroll_press(16, '-')
     elif mode == 'seek':  # v.0.0.4
-        seeking('+')
+        repeat_start(16, seek_step, ('+',), 'SEEK')
     elif mode == 'prevnext':  # v.0.0.4
         prevnext('next')
 
@@ -665,22 +1793,156 @@ def button_x(mode, status):  # optimieren, VOLUMIO_DICT['MODE'] durch mode (loka
 def button_y(mode, status):  # optimieren, VOLUMIO_DICT['MODE'] durch mode (lokale variable) ersetzen
     #print('button_y6, mode:', mode, 'pin:', pin)
     if mode == 'seek':
-        seeking('-')
+        repeat_start(BUTTONS[3], seek_step, ('-',), 'SEEK')
     elif mode == 'prevnext':
         prevnext('prev')
+    elif mode == 'player':
+        repeat_start(BUTTONS[3], volume_step, ('+',), 'VOLUME')
+    elif mode in ['navigation', 'menu']:  # v.0.0.7 hint pylint
+        scroll_press(BUTTONS[3], '+')
+
+
+def volume_step(direction):
+    """one volume step, stops at volume 0 and 100 so amixer dont go crazy"""
+    if VOLUMIO_DICT['MODE'] != 'player' or (direction == '+' and VOLUMIO_DICT['VOLUME'] >= 100) or (direction == '-' and VOLUMIO_DICT['VOLUME'] <= 0):
+        return False
+    SOCKETIO.emit('volume', direction)
+    return True
+
+
+def scroll_step(direction):
+    """moves the marker one entry up (-) or down (+), wraps around at both ends"""
+    if VOLUMIO_DICT['MODE'] not in ['navigation', 'menu'] or NAV_DICT['LISTRESULT'] < 1:
+        return False
+    if direction == '-':
+        NAV_DICT['MARKER'] -= 1  # count minus 1
+        if NAV_DICT['MARKER'] < 0:  # blaettere nach oben durch
+            NAV_DICT['MARKER'] = NAV_DICT['LISTRESULT'] - 1
+    else:
+        NAV_DICT['MARKER'] += 1  # count plus 1
+        if NAV_DICT['MARKER'] > NAV_DICT['LISTRESULT'] - 1:  # blaettere nach unten durch
+            NAV_DICT['MARKER'] = 0
+    NAV_DICT['LISTSTART'] = int(floor(NAV_DICT['MARKER']/NAV_DICT['LISTMAX'])*NAV_DICT['LISTMAX'])  # definiert das blaettern zur naechsten Seite
+    display_stuff(IMAGE_DICT['BG_DEFAULT'], NAV_ARRAY_NAME, NAV_DICT['MARKER'], NAV_DICT['LISTSTART'])
+    return True
+
+
+def scroll_press(pin, direction):
+    """X/Y in a list: one entry per press, drawn at once, a double tap in a library list of more than one page
+    jumps to the next/previous initial letter"""
+    now = monotonic()
+    last_pin, last_time, marker = INDEX_DICT['TAP']
+    doubletap = VOLUMIO_DICT['MODE'] == 'navigation' and NAV_DICT['LISTRESULT'] > NAV_DICT['LISTMAX'] and INDEX_DICT['DOUBLETAP'] > 0
+    if doubletap and last_pin == pin and now - last_time < INDEX_DICT['DOUBLETAP']:
+        INDEX_DICT['TAP'] = (None, 0, 0)  # a third press is a single step again
+        NAV_DICT['MARKER'] = marker  # jump from where the first press started, its step gets overdrawn
+        repeat_start(pin, jump_step, (direction,), 'JUMP')  # held, it keeps jumping
+        return
+    INDEX_DICT['TAP'] = (pin, now, NAV_DICT['MARKER'])
+    repeat_start(pin, scroll_step, (direction,), 'SCROLL')
+
+
+def letter_initial(name):
+    """initial letter of name for the index: first letter or digit without accents, upper case, '#' for digits and symbols"""
+    for char in name[:16]:
+        if char.isalnum():
+            break
+    else:
+        return '#'
+    initial = INDEX_DICT['INITIALS'].get(char)
+    if initial is None:
+        initial = unicodedata.normalize('NFKD', char)[0].upper()[0]  # e.g. 'É' -> 'E', 'ß' -> 'S'
+        if not initial.isalpha():
+            initial = '#'
+        INDEX_DICT['INITIALS'][char] = initial
+    return initial
+
+
+def letter_index():
+    """index of the initial letters of NAV_ARRAY_NAME, built once per list, so every jump is O(1)"""
+    names = NAV_ARRAY_NAME
+    if INDEX_DICT['NAMES'] is not names:
+        initials = [letter_initial(name) for name in names]
+        letters = set(initials)
+        for letter in letters:
+            if letter not in INDEX_DICT['SORTKEYS']:
+                INDEX_DICT['SORTKEYS'][letter] = locale.strxfrm(letter)
+        letters = sorted(letters, key=INDEX_DICT['SORTKEYS'].__getitem__)
+        ranks = dict((letter, i) for i, letter in enumerate(letters))
+        rank = array('H', [ranks[initial] for initial in initials])
+        first = [None] * len(letters)
+        for position in range(len(rank) - 1, -1, -1):
+            first[rank[position]] = position
+        INDEX_DICT['NAMES'], INDEX_DICT['INDEX'] = names, ((rank, first) if len(letters) > 1 else None)
+    return INDEX_DICT['INDEX']
+
+
+def jump_step(direction):
+    """moves the marker to the first entry of the next (+) or previous (-) initial letter,
+    a page if the list has only one initial, wraps around at both ends"""
+    if VOLUMIO_DICT['MODE'] != 'navigation' or NAV_DICT['LISTRESULT'] < 2:
+        return False
+    marker = NAV_DICT['MARKER']
+    index = letter_index()
+    if index is None:
+        pages = int(ceil(float(NAV_DICT['LISTRESULT']) / NAV_DICT['LISTMAX']))
+        page = (marker // NAV_DICT['LISTMAX'] + (1 if direction == '+' else -1)) % pages
+        marker = page * NAV_DICT['LISTMAX']
     else:
-        while not GPIO.input(BUTTONS[3]):
-            if mode == 'player' and VOLUMIO_DICT['VOLUME'] < 100:  # limit/exit at volume 100 so amixer dont go crazy
-                SOCKETIO.emit('volume', '+')
-                sleep(0.5)
-            elif mode in ['navigation', 'menu']:  # v.0.0.7 hint pylint
-                NAV_DICT['MARKER'] += 1  # count plus 1
-                NAV_DICT['LISTSTART'] = int(floor(NAV_DICT['MARKER']/NAV_DICT['LISTMAX'])*NAV_DICT['LISTMAX'])  # definiert das blaettern zur naechsten Seite
-                if NAV_DICT['MARKER'] > NAV_DICT['LISTRESULT'] - 1:  # blaettere nach unten durch
-                    NAV_DICT['MARKER'] = 0
-                    NAV_DICT['LISTSTART'] = 0
-                display_stuff(IMAGE_DICT['BG_DEFAULT'], NAV_ARRAY_NAME, NAV_DICT['MARKER'], NAV_DICT['LISTSTART'])
-                sleep(0.1)  # v.0.0.7
+        rank, first = index
+        if direction == '+':
+            marker = first[(rank[marker] + 1) % len(first)]
+        elif marker != first[rank[marker]]:  # start of the own letter first
+            marker = first[rank[marker]]
+        else:
+            marker = first[rank[marker] - 1]
+    NAV_DICT['MARKER'] = marker
+    NAV_DICT['LISTSTART'] = int(floor(NAV_DICT['MARKER']/NAV_DICT['LISTMAX'])*NAV_DICT['LISTMAX'])
+    display_stuff(IMAGE_DICT['BG_DEFAULT'], NAV_ARRAY_NAME, NAV_DICT['MARKER'], NAV_DICT['LISTSTART'])
+    return True
+
+
+def seek_step(direction):
+    """one seek step, stops at the start and the end of the track"""
+    seek = VOLUMIO_DICT['SEEK']
+    if VOLUMIO_DICT['MODE'] != 'seek':
+        return False
+    seeking(direction)
+    return VOLUMIO_DICT['SEEK'] != seek
+
+
+def repeat_start(pin, function, args, curve):
+    """does a step at once and lets the repeat scheduler repeat it as long as pin is held, returns immediately"""
+    with REPEAT_DICT['COND']:
+        REPEAT_DICT['PIN'] = None  # a new press ends the repeat of the button before
+    if not function(*args):
+        return
+    with REPEAT_DICT['COND']:
+        REPEAT_DICT['PIN'], REPEAT_DICT['STEP'], REPEAT_DICT['CURVE'] = pin, (function, args), REPEAT_DICT[curve]
+        REPEAT_DICT['INTERVAL'] = REPEAT_DICT[curve][0]
+        REPEAT_DICT['DUE'] = monotonic() + REPEAT_DICT['INTERVAL']
+        REPEAT_DICT['COND'].notify_all()
+
+
+def repeat_helper():
+    """helper function as thread, repeats the step of the held button along its curve until release or limit"""
+    while True:
+        with REPEAT_DICT['COND']:
+            REPEAT_DICT['COND'].wait_for(lambda: REPEAT_DICT['PIN'] is not None)
+            delay = REPEAT_DICT['DUE'] - monotonic()
+            if delay > 0:
+                REPEAT_DICT['COND'].wait(delay)  # woken early by a new press
+                continue
+            pin, step, curve = REPEAT_DICT['PIN'], REPEAT_DICT['STEP'], REPEAT_DICT['CURVE']
+            REPEAT_DICT['INTERVAL'] = max(curve[1], REPEAT_DICT['INTERVAL'] * curve[2])
+            REPEAT_DICT['DUE'] = monotonic() + REPEAT_DICT['INTERVAL']
+        trace_begin('button')
+        if GPIO.input(pin) or not step[0](*step[1]):  # released (pull up) or limit reached
+            with REPEAT_DICT['COND']:
+                if REPEAT_DICT['PIN'] == pin and REPEAT_DICT['STEP'] is step:
+                    REPEAT_DICT['PIN'] = None
+        trace_emitted()
+        trace_end()
 
 
 def setup_channel(channel):
@@ -689,7 +1951,7 @@ def setup_channel(channel):
     try:
         print('register %d' % channel)  # v0.0.6
         GPIO.setup(channel, GPIO.IN, GPIO.PUD_UP)
-        GPIO.add_event_detect(channel, GPIO.FALLING, handle_button, bouncetime=250)
+        GPIO.add_event_detect(channel, GPIO.FALLING, handle_button, bouncetime=int(BOUNCETIME * 1000))
         print('success')
         sleep(0.1)  # v.0.0.7
     except (ValueError, RuntimeError) as e:
@@ -697,10 +1959,6 @@ def setup_channel(channel):
     # print("setup_channel--- %s seconds ---" % (time() - start_time))  # debug, time of code execution
 
 
-for xb in BUTTONS:
-    setup_channel(xb)
-
-
 def main():
     """waits for websocket messages"""
     SOCKETIO.wait()
@@ -708,26 +1966,231 @@ def main():
 
 
 def display_refresh():  # v0.0.7
-    """processes display refresh for remaing time"""
-    #if WS_CONNECTED and VOLUMIO_DICT['SERVICE'] not in ['webradio'] and VOLUMIO_DICT['STATUS'] not in ['stop', 'pause'] and VOLUMIO_DICT['MODE'] == 'player' and time() >= IMAGE_DICT['LASTREFRESH'] + 4.5: # v0.0.7 hint pylint
-    if VOLUMIO_DICT['STATE_LAST'] and VOLUMIO_DICT['SERVICE'] not in ['webradio'] and VOLUMIO_DICT['STATUS'] not in ['stop', 'pause'] and VOLUMIO_DICT['MODE'] == 'player' and time() >= IMAGE_DICT['LASTREFRESH'] + 4.5: # v0.0.7 hint pylint
-        SOCKETIO.emit('getState')
+    """processes display refresh for remaing time, from the local playback clock"""
+    if VOLUMIO_DICT['STATE_LAST'] and VOLUMIO_DICT['SERVICE'] not in ['webradio'] and VOLUMIO_DICT['STATUS'] not in ['stop', 'pause'] and VOLUMIO_DICT['MODE'] == 'player' and VOLUMIO_DICT['TIMEBAR']:
+        seek = clock_seek()
+        # resync if the track should have ended already, the last pushstate drifted from the clock or we had no pushstate for a long time
+        if seek > VOLUMIO_DICT['DURATION'] * 1000 + CLOCK_DICT['TOLERANCE'] or abs(CLOCK_DICT['DRIFT']) > CLOCK_DICT['TOLERANCE'] or (CLOCK_DICT['RESYNC'] and monotonic() >= CLOCK_DICT['ANCHOR'] + CLOCK_DICT['RESYNC']):
+            CLOCK_DICT['ANCHOR'], CLOCK_DICT['SEEK'] = monotonic(), min(seek, VOLUMIO_DICT['DURATION'] * 1000)  # ask only once per resync interval
+            CLOCK_DICT['DRIFT'] = 0  # once per drifted pushstate
+            SOCKETIO.emit('getState')
+        VOLUMIO_DICT['SEEK'] = min(seek, VOLUMIO_DICT['DURATION'] * 1000)
+        render_player()
 
 
 def display_helper():  # v0.0.7
     """helper function as thread"""
     while True:
+        trace_begin('clock')
         display_refresh()
-        sleep(5)
+        trace_end()
+        sleep(1.0 / CLOCK_DICT['RATE'])
 
 
 THREAD1 = Thread(target=display_helper)  # v0.0.7
 THREAD1.daemon = True  # v0.0.7
+THREAD2 = Thread(target=prefetch_helper)
+THREAD2.daemon = True
+THREAD3 = Thread(target=render_helper)
+THREAD3.daemon = True
+THREAD4 = Thread(target=repeat_helper)
+THREAD4.daemon = True
+THREAD5 = Thread(target=marquee_helper)
+THREAD5.daemon = True
+
+
+def aio_handler(function):
+    """wraps a handler of the thread runtime for the asyncio runtime, handlers run one after another on the handler executor"""
+    import asyncio
+
+    async def run(*args):
+        if function is on_push_state and args:
+            AIO_DICT['STATE_SEQ'] += 1
+            seq = AIO_DICT['STATE_SEQ']
+            await aio_art(args[0])
+            if seq != AIO_DICT['STATE_SEQ']:  # a newer state arrived while fetching, only that one gets processed
+                return
+        await AIO_DICT['LOOP'].run_in_executor(AIO_DICT['EXECUTOR'], partial(function, *args))
+
+    async def wrapper(*args):
+        asyncio.ensure_future(run(*args))  # never hold up the websocket while albumart gets fetched
+    return wrapper
+
+
+class AsyncSocketIO(object):
+    """emit and on of socketIO_client on top of a python-socketio AsyncClient, so the handlers work unchanged"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def on(self, event, function):
+        self.client.on(event, aio_handler(function))
+
+    def emit(self, event, *args):
+        """thread safe, callable from handlers, buttons and the clock"""
+        import asyncio
+        callback = None
+        if args and callable(args[-1]):
+            callback, args = aio_handler(args[-1]), args[:-1]
+        data = args[0] if args else None
+        asyncio.run_coroutine_threadsafe(self.client.emit(event, data, callback=callback), AIO_DICT['LOOP'])
+
+
+async def aio_fetch(url):
+    """fetches albumart without blocking the event loop, decoding and caching run on the default executor"""
+    import asyncio
+    import aiohttp
+    content, validators, size = None, None, 0
+    try:
+        async with AIO_DICT['SESSION'].get(url) as response:
+            if response.status != 200:  # error pages are no albumart
+                raise aiohttp.ClientResponseError(response.request_info, response.history, status=response.status, message=response.reason)
+            chunks = []
+            async for chunk in response.content.iter_chunked(65536):
+                size += len(chunk)
+                if size > ARTFETCH_DICT['MAX_BYTES']:
+                    raise ValueError('too large')
+                chunks.append(chunk)
+            content = b''.join(chunks)
+            validators = {"ETAG": response.headers.get('ETag'), "MODIFIED": response.headers.get('Last-Modified'), "CHECKED": time()}
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        print('ERROR at albumart:', url, e)
+        AIO_DICT['FAILED'][url] = monotonic()  # nothing cached, art_get() shows the default background, tried again after RETRY
+        return
+    AIO_DICT['FAILED'].pop(url, None)
+    entry = None
+    if content:
+        entry = await AIO_DICT['LOOP'].run_in_executor(None, art_decode, content, url)
+    if entry is None:  # not displayable, remember the default background in memory, so the handler does not fetch it again
+        await AIO_DICT['LOOP'].run_in_executor(None, artcache_put, url, (IMAGE_DICT['BG_DEFAULT'], art_palette(IMAGE_DICT['BG_DEFAULT'])), False)
+    else:
+        await AIO_DICT['LOOP'].run_in_executor(None, partial(artcache_put, url, entry, validators=validators))
+
+
+def aio_failed(url):
+    """True if the asyncio runtime failed to fetch url less than RETRY seconds ago"""
+    failed = AIO_DICT['FAILED'].get(url)
+    return failed is not None and monotonic() - failed < AIO_DICT['RETRY']
+
+
+async def aio_art(state):
+    """makes sure the albumart of a pushstate is cached before the state gets processed"""
+    import asyncio
+    url = art_url(state.get('albumart', '').encode('ascii', 'ignore').decode('utf-8'))
+    if aio_failed(url) or await AIO_DICT['LOOP'].run_in_executor(None, artcache_get, url) is not None:
+        return
+    if url not in AIO_DICT['INFLIGHT']:  # fetch every url only once, even if several states ask for it
+        AIO_DICT['INFLIGHT'][url] = asyncio.ensure_future(aio_fetch(url))
+        AIO_DICT['INFLIGHT'][url].add_done_callback(lambda future: AIO_DICT['INFLIGHT'].pop(url, None))
+    await asyncio.shield(AIO_DICT['INFLIGHT'][url])
 
 
-try:
-    THREAD1.start()  # v0.0.7
-    main()
-except KeyboardInterrupt:
-    clean()
+async def aio_clock():
+    """display refresh of the local playback clock, on the handler executor"""
+    import asyncio
+    while True:
+        await AIO_DICT['LOOP'].run_in_executor(AIO_DICT['EXECUTOR'], display_refresh)
+        await asyncio.sleep(1.0 / CLOCK_DICT['RATE'])
+
+
+async def aio_run():
+    """asyncio runtime: websocket and albumart on one event loop, handlers and rendering on executors"""
+    import asyncio
+    import aiohttp
+    import socketio
+    from concurrent.futures import ThreadPoolExecutor
+    global SOCKETIO
+    AIO_DICT['LOOP'] = asyncio.get_running_loop()
+    AIO_DICT['EXECUTOR'] = ThreadPoolExecutor(max_workers=1)  # handlers share the globals, run them in order
+    client = socketio.AsyncClient()
+    SOCKETIO = AsyncSocketIO(client)
+    client.on('connect', aio_handler(on_connect))  # again after every reconnect
+    client.on('disconnect', aio_handler(on_disconnect))
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(sock_connect=ARTFETCH_DICT['CONNECT_TIMEOUT'], sock_read=ARTFETCH_DICT['READ_TIMEOUT'])) as session:
+        AIO_DICT['SESSION'] = session
+        await client.connect('http://localhost:3000')
+        await AIO_DICT['LOOP'].run_in_executor(None, setup_buttons)
+        asyncio.ensure_future(aio_clock())
+        await client.wait()
+
+
+def aio_available():
+    """True if the asyncio runtime is selected in config.json and its packages are installed"""
+    if get_config('runtime', 'thread') != 'asyncio':
+        return False
+    from importlib.util import find_spec
+    missing = [name for name in ['aiohttp', 'socketio'] if find_spec(name) is None]
+    if missing:
+        print('ERROR at asyncio runtime, using thread runtime: missing', ', '.join(missing))
+        return False
+    return True
+
+
+def aio_main():
+    """runs the asyncio runtime until exit"""
+    import asyncio
+    asyncio.run(aio_run())
+
+
+def setup_buttons():
+    """registers the buttons"""
+    GPIO.setmode(GPIO.BCM)  # Set up RPi.GPIO with BCM numbering scheme
+    for xb in BUTTONS:
+        setup_channel(xb)
+
+
+def startup_log():
+    """logs how long each step until the first frame took, returns them in ms"""
+    steps = OrderedDict()
+    for i in range(1, len(STARTUP)):
+        steps[STARTUP[i][0]] = round((STARTUP[i][1] - STARTUP[i - 1][1]) * 1000, 1)
+    steps['total'] = round((STARTUP[-1][1] - STARTUP[0][1]) * 1000, 1)
+    print('startup (ms):', ', '.join(['%s %.1f' % step for step in steps.items()]))
+    if steps['total'] > float(get_config('startup_budget_ms', 1500)):
+        print('startup over budget of %s ms' % get_config('startup_budget_ms', 1500))
+    return steps
+
+
+def startup():
+    """shows first frame and registers the signals"""
+    for sig in (signal.SIGABRT, signal.SIGILL, signal.SIGINT, signal.SIGSEGV, signal.SIGTERM):
+        signal.signal(sig, clean)
+    signal.signal(signal.SIGUSR1, trace_dump)
+    signal.signal(signal.SIGHUP, config_reload)
+    try:
+        locale.setlocale(locale.LC_COLLATE, '')  # letter index sorts like the system language
+    except locale.Error as e:
+        print('ERROR at locale:', e)
+    display_stuff(IMAGE_DICT['BG_DEFAULT'], OBJ_TRANS['DISPLAY']['WAIT'], 0, 0, 'info')
+    STARTUP.append(('first_frame', monotonic()))
+    startup_log()
+    icon_atlas()
+
+
+def connect(host='localhost', port=3000):
+    """connects to volumio and registers buttons, thread runtime"""
+    from socketIO_client import SocketIO
+    global SOCKETIO
+    SOCKETIO = SocketIO(host, port)  # returns connected, the connect packet may already be consumed by the handshake
+    SOCKETIO.on('disconnect', on_disconnect)
+    on_connect()
+    setup_buttons()
+
+
+if __name__ == '__main__':
+    startup()
+    try:
+        THREAD2.start()
+        RENDER_DICT['THREAD'] = THREAD3  # from now on callbacks only post render requests
+        THREAD3.start()
+        THREAD4.start()
+        THREAD5.start()
+        if aio_available():
+            aio_main()
+        else:
+            connect()
+            THREAD1.start()  # v0.0.7
+            main()
+    except KeyboardInterrupt:
+        clean()
 # pass
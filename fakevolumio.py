@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""Local stand-in for the volumio websocket (socket.io) and albumart endpoint.
+
+Serves the events display.py uses (pushState, pushQueue, pushBrowseSources,
+pushBrowseLibrary), reacts on the emits of the plugin (getState, getQueue,
+getBrowseSources, browseLibrary, play, pause, stop, volume, seek,
+replaceAndPlay, playPlaylist, setSleep, shutdown, reboot) and serves
+/albumart with synthetic covers. Recorded traces can be replayed at any
+speed, stress scenarios generate state storms, huge libraries and queues.
+
+    python3 fakevolumio.py serve --library 10000 --queue 5000
+    python3 fakevolumio.py serve --scenario storm --rate 50 --duration 30 --stats stats.json
+    python3 fakevolumio.py serve --scenario trace --trace trace.jsonl --speed 4
+    python3 fakevolumio.py record --host volumio.local --output trace.jsonl
+
+Needs python-socketio 4.x and aiohttp (Engine.IO 3, the protocol of
+socketIO-client and of volumio), recording needs socketIO-client.
+Like volumio, requests get answered by push events only, never by an ack.
+"""
+
+import sys
+import json
+import argparse
+import asyncio
+from io import BytesIO
+from random import Random
+from time import monotonic
+
+from PIL import Image, ImageDraw
+
+
+def synthetic_art(size, seed=0):
+    """jpeg cover of size x size pixels with enough detail to be realistic for decoding"""
+    rnd = Random(seed)
+    img = Image.new('RGB', (size, size))
+    draw = ImageDraw.Draw(img)
+    for y in range(0, size, max(size // 60, 1)):  # gradient
+        draw.rectangle((0, y, size, y + size // 60), ((y * 255 // size + seed * 40) % 256, 80, 255 - y * 255 // size))
+    for i in range(200):  # shapes
+        x, y, r = rnd.randrange(size), rnd.randrange(size), rnd.randrange(size // 10 + 1)
+        draw.ellipse((x - r, y - r, x + r, y + r), (rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)))
+    data = BytesIO()
+    img.save(data, 'JPEG', quality=90)
+    return data.getvalue()
+
+
+def percentile(values, p):
+    """nearest-rank percentile of sorted values"""
+    if not values:
+        return 0
+    return values[max(-(-p * len(values) // 100) - 1, 0)]
+
+
+class FakeVolumio:
+    """state, queue and library of the fake volumio, plus statistics of all traffic"""
+
+    def __init__(self, library_size, queue_size, art_size):
+        self.art_size = art_size
+        self.art = {}  # (seed, size) -> jpeg
+        self.library_size = library_size
+        self.queue = [self.track(i, 'Queue') for i in range(queue_size)]
+        self.state = {
+            "status": 'stop', "position": 0, "title": '', "artist": '', "album": '',
+            "albumart": '/albumart', "uri": '', "trackType": 'flac', "seek": 0, "duration": 0,
+            "random": False, "repeat": False, "repeatSingle": False, "consume": False,
+            "volume": 50, "mute": False, "disableVolumeControl": False, "stream": False,
+            "updatedb": False, "volatile": False, "service": 'mpd'
+        }
+        self.started = monotonic()  # monotonic time seek was last set
+        self.load(0)
+        self.received = {}  # event -> count
+        self.sent = {}
+        self.handling = []  # seconds from request to push
+        self.lag = []  # seconds scheduled pushes of scenarios were late
+        self.begin = monotonic()
+
+    def track(self, i, album):
+        """queue item / library song"""
+        return {
+            "uri": 'music-library/%s/%05d.flac' % (album, i), "service": 'mpd', "type": 'song',
+            "name": 'Track %d of %s' % (i, album), "title": 'Track %d of %s' % (i, album),
+            "artist": 'Artist %d' % (i % 97), "album": album, "tracknumber": i,
+            "albumart": '/albumart?cacheid=%d&size=%d' % (i % 50, self.art_size), "duration": 180 + i % 120
+        }
+
+    def load(self, position):
+        """makes queue entry position the current track"""
+        if not self.queue:
+            self.state.update(title='', artist='', album='', albumart='/albumart', duration=0, seek=0)
+            return
+        item = self.queue[position % len(self.queue)]
+        self.state.update(
+            position=position % len(self.queue), title=item['name'], artist=item['artist'], album=item['album'],
+            albumart=item['albumart'], uri=item['uri'], duration=item['duration'], seek=0)
+        self.started = monotonic()
+
+    def current(self):
+        """state with the seek volumio would report now"""
+        if self.state['status'] == 'play':
+            self.state['seek'] += int((monotonic() - self.started) * 1000)
+        self.started = monotonic()
+        return dict(self.state)
+
+    def sources(self):
+        """answer of getBrowseSources"""
+        return [
+            {"name": 'Music Library', "uri": 'music-library', "plugin_type": '', "plugin_name": 'mpd', "albumart": '/albumart?sourceicon=music_service/mpd/musiclibraryicon.png'},
+            {"name": 'Playlists', "uri": 'playlists', "plugin_type": '', "plugin_name": 'mpd', "albumart": '/albumart?sourceicon=music_service/mpd/playlisticon.png'},
+            {"name": 'Web Radio', "uri": 'radio', "plugin_type": 'music_service', "plugin_name": 'webradio', "albumart": '/albumart?sourceicon=music_service/webradio/icon.png'}
+        ]
+
+    def browse(self, uri):
+        """answer of browseLibrary, the folder music-library/Huge has library_size songs"""
+        prev = uri.rsplit('/', 1)[0] if '/' in uri else '/'
+        if uri == 'music-library':
+            items = [{"service": 'mpd', "type": 'folder', "title": 'Folder %d' % i, "uri": 'music-library/Folder %d' % i} for i in range(10)]
+            items.append({"service": 'mpd', "type": 'folder', "title": 'Huge', "uri": 'music-library/Huge'})
+        elif uri == 'music-library/Huge':
+            items = [self.track(i, 'Huge') for i in range(self.library_size)]
+        elif uri.startswith('music-library/'):
+            items = [self.track(i, uri.split('/')[-1]) for i in range(20)]
+        elif uri == 'playlists':
+            items = [{"service": 'mpd', "type": 'playlist', "title": 'Playlist %d' % i, "uri": 'playlists/Playlist %d' % i} for i in range(10)]
+        elif uri == 'radio':
+            items = [{"service": 'webradio', "type": 'webradio', "title": 'Radio %d' % i, "uri": 'http://127.0.0.1/radio/%d' % i, "albumart": '/albumart?cacheid=radio%d' % i} for i in range(50)]
+        else:
+            items = []
+        return {"navigation": {"prev": {"uri": prev}, "lists": [{"availableListViews": ['list'], "items": items}]}}
+
+    def albumart(self, query):
+        """synthetic jpeg, cacheid chooses the cover, size its width and height"""
+        seed = sum(ord(c) for c in query.get('cacheid', query.get('path', '')))
+        size = int(query.get('size', self.art_size))
+        if (seed, size) not in self.art:
+            self.art[(seed, size)] = synthetic_art(size, seed)
+        return self.art[(seed, size)]
+
+    def command(self, event, data):
+        """applies an emit of the plugin, returns True if the state changed"""
+        if event == 'play':
+            if isinstance(data, dict) and 'value' in data:
+                self.load(int(data['value']))
+            self.current()
+            self.state['status'] = 'play'
+        elif event == 'pause':
+            self.current()
+            self.state['status'] = 'pause'
+        elif event == 'stop':
+            self.state['status'], self.state['seek'] = 'stop', 0
+        elif event == 'volume':
+            if data == '+':
+                self.state['volume'] = min(self.state['volume'] + 10, 100)
+            elif data == '-':
+                self.state['volume'] = max(self.state['volume'] - 10, 0)
+            else:
+                self.state['volume'] = max(min(int(data), 100), 0)
+        elif event == 'seek':
+            self.state['seek'], self.started = int(data) * 1000, monotonic()
+        elif event == 'replaceAndPlay':
+            item = dict(data, name=data.get('title', ''), artist=data.get('artist', ''), album=data.get('album', ''),
+                        albumart=data.get('albumart', '/albumart?cacheid=replace'), duration=0 if data.get('service') == 'webradio' else 200)
+            self.queue = [item]
+            self.load(0)
+            self.state['status'], self.state['service'] = 'play', data.get('service', 'mpd')
+        elif event == 'playPlaylist':
+            self.queue = [self.track(i, data.get('name', 'Playlist')) for i in range(20)]
+            self.load(0)
+            self.state['status'] = 'play'
+        else:  # setSleep, shutdown, reboot only get counted
+            return False
+        return True
+
+    def stats(self):
+        """throughput of both directions and latencies in ms"""
+        elapsed = monotonic() - self.begin
+        handling, lag = sorted(self.handling), sorted(self.lag)
+        return {
+            "elapsed": round(elapsed, 3),
+            "received": self.received,
+            "sent": self.sent,
+            "received_per_second": round(sum(self.received.values()) / elapsed, 3) if elapsed else 0,
+            "sent_per_second": round(sum(self.sent.values()) / elapsed, 3) if elapsed else 0,
+            "handling_ms": {"p50": percentile(handling, 50) * 1000, "p95": percentile(handling, 95) * 1000, "max": handling[-1] * 1000 if handling else 0},
+            "lag_ms": {"p50": percentile(lag, 50) * 1000, "p95": percentile(lag, 95) * 1000, "max": lag[-1] * 1000 if lag else 0}
+        }
+
+
+def serve(args):
+    """runs the fake volumio until the scenario is finished or ctrl-c"""
+    import socketio  # python-socketio 4.x
+    from aiohttp import web
+
+    sio = socketio.AsyncServer(async_mode='aiohttp')
+    app = web.Application()
+    sio.attach(app)
+    volumio = FakeVolumio(args.library, args.queue, args.art_size)
+
+    async def push(event, data, to=None):
+        volumio.sent[event] = volumio.sent.get(event, 0) + 1
+        await sio.emit(event, data, room=to)
+
+    def handler(event):
+        async def on_event(sid, *data):
+            start = monotonic()
+            volumio.received[event] = volumio.received.get(event, 0) + 1
+            data = data[0] if data else None
+            if event == 'getState':
+                await push('pushState', volumio.current(), sid)
+            elif event == 'getQueue':
+                await push('pushQueue', volumio.queue, sid)
+            elif event == 'getBrowseSources':
+                await push('pushBrowseSources', volumio.sources(), sid)
+            elif event == 'browseLibrary':
+                await push('pushBrowseLibrary', volumio.browse((data or {}).get('uri', '')), sid)
+            elif volumio.command(event, data):
+                if event in ['replaceAndPlay', 'playPlaylist']:
+                    await push('pushQueue', volumio.queue)
+                await push('pushState', volumio.current())
+            volumio.handling.append(monotonic() - start)
+        return on_event
+
+    for event in ['getState', 'getQueue', 'getBrowseSources', 'browseLibrary', 'play', 'pause', 'stop', 'volume',
+                  'seek', 'replaceAndPlay', 'playPlaylist', 'setSleep', 'shutdown', 'reboot']:
+        sio.on(event, handler(event))
+
+    async def albumart(request):
+        return web.Response(body=volumio.albumart(request.query), content_type='image/jpeg')
+    app.router.add_get('/albumart', albumart)
+
+    async def storm():
+        """pushStates at rate per second, volume and seek change every time, the track every 50th"""
+        interval, due = 1.0 / args.rate, monotonic()
+        volumio.command('play', None)
+        for i in range(int(args.duration * args.rate)):
+            due += interval
+            await asyncio.sleep(max(due - monotonic(), 0))
+            volumio.lag.append(max(monotonic() - due, 0))
+            if i % 50 == 49:
+                volumio.load(volumio.state['position'] + 1)
+            volumio.state['volume'] = i % 101
+            await push('pushState', volumio.current())
+
+    async def trace():
+        """replays a recorded trace, one json object {"t": seconds, "event": ..., "data": ...} per line"""
+        with open(args.trace, 'r') as mytracefile:
+            records = [json.loads(line) for line in mytracefile if line.strip()]
+        begin = monotonic()
+        for record in records:
+            due = begin + record.get('t', 0) / args.speed
+            await asyncio.sleep(max(due - monotonic(), 0))
+            volumio.lag.append(max(monotonic() - due, 0))
+            if record['event'] == 'pushState':
+                volumio.state.update(record['data'])
+                volumio.started = monotonic()
+            elif record['event'] == 'pushQueue':
+                volumio.queue = record['data']
+            await push(record['event'], record['data'])
+
+    async def run():
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, args.host, args.port).start()
+        print('fake volumio on %s:%d' % (args.host, args.port))
+        try:
+            if args.wait:
+                await asyncio.sleep(args.wait)  # time for the plugin to connect
+            if args.scenario == 'storm':
+                await storm()
+            elif args.scenario == 'trace':
+                await trace()
+            else:
+                await asyncio.sleep(args.duration or 10 ** 9)
+        finally:
+            await runner.cleanup()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    result = volumio.stats()
+    print(json.dumps(result, indent=2))
+    if args.stats:
+        with open(args.stats, 'w') as mystatsfile:
+            json.dump(result, mystatsfile, indent=2)
+
+
+def record(args):
+    """records the push events of a real volumio as trace for serve --scenario trace"""
+    from socketIO_client import SocketIO
+
+    begin = monotonic()
+    with open(args.output, 'w') as mytracefile:
+        def recorder(event):
+            def on_event(*data):
+                mytracefile.write(json.dumps({"t": round(monotonic() - begin, 3), "event": event, "data": data[0] if data else None}) + '\n')
+                mytracefile.flush()
+            return on_event
+
+        socket = SocketIO(args.host, args.port)
+        for event in ['pushState', 'pushQueue', 'pushBrowseSources', 'pushBrowseLibrary']:
+            socket.on(event, recorder(event))
+        socket.emit('getState')
+        socket.emit('getQueue')
+        try:
+            socket.wait(seconds=args.duration or None)
+        except KeyboardInterrupt:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='fake volumio for trace replay and load tests of display.py')
+    commands = parser.add_subparsers(dest='command')
+    parser_serve = commands.add_parser('serve', help='run the fake volumio')
+    parser_serve.add_argument('--host', default='localhost')
+    parser_serve.add_argument('--port', type=int, default=3000)
+    parser_serve.add_argument('--library', type=int, default=10000, help='songs in music-library/Huge')
+    parser_serve.add_argument('--queue', type=int, default=50, help='tracks in the queue')
+    parser_serve.add_argument('--art-size', type=int, default=600, help='width and height of the covers')
+    parser_serve.add_argument('--scenario', choices=['idle', 'storm', 'trace'], default='idle')
+    parser_serve.add_argument('--rate', type=float, default=50, help='pushStates per second of the storm')
+    parser_serve.add_argument('--duration', type=float, default=0, help='seconds of storm or idle, 0 runs until ctrl-c')
+    parser_serve.add_argument('--trace', help='jsonl trace to replay')
+    parser_serve.add_argument('--speed', type=float, default=1, help='replay speed of the trace')
+    parser_serve.add_argument('--wait', type=float, default=0, help='seconds to wait before the scenario starts')
+    parser_serve.add_argument('--stats', help='write statistics as json to this file')
+    parser_record = commands.add_parser('record', help='record push events of a real volumio')
+    parser_record.add_argument('--host', default='localhost')
+    parser_record.add_argument('--port', type=int, default=3000)
+    parser_record.add_argument('--duration', type=float, default=0, help='seconds to record, 0 records until ctrl-c')
+    parser_record.add_argument('--output', default='trace.jsonl')
+    args = parser.parse_args()
+    if args.command == 'record':
+        record(args)
+    elif args.command == 'serve':
+        if args.scenario == 'storm' and not args.duration:
+            args.duration = 10
+        serve(args)
+    else:
+        parser.print_help()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
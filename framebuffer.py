@@ -0,0 +1,95 @@
+"""Working frame of the display as rgb565, the pixel format of the ST7789.
+
+Frames get converted once with numpy and kept as 16 bit big endian pixels,
+so changed rectangles are found by comparing integers and the bytes of a
+window can be sent to the display (or the simulator) without converting
+the image again.
+"""
+
+import numpy
+
+
+def rgb565(image):
+    """vectorized rgb565 of a PIL image, alpha is ignored like the ST7789 driver does"""
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB')
+    pb = numpy.asarray(image)
+    r = pb[:, :, 0].astype('uint16')
+    g = pb[:, :, 1].astype('uint16')
+    b = pb[:, :, 2].astype('uint16')
+    return ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
+
+
+class Framebuffer:
+    """rgb565 frame in image coordinates, the rotation of the panel is applied when bytes are taken out"""
+
+    def __init__(self, width, height, rotation=0, band=16):
+        self.width = width
+        self.height = height
+        self.rotation = rotation
+        self.band = band  # height of the bands changed rectangles are searched in
+        self.pixels = numpy.zeros((height, width), dtype='>u2')  # big endian, as the display expects it
+        self.valid = False  # nothing was pasted yet, the display shows something unknown
+
+    def paste(self, image, xy=(0, 0)):
+        """pastes a PIL image at xy, returns the changed rectangles (left, top, right, bottom)"""
+        return self.put(rgb565(image), xy)
+
+    def blend(self, image, xy=(0, 0), alpha=128):
+        """mixes a PIL image at xy into the frame, alpha 0 keeps the frame, 255 is a paste"""
+        new = rgb565(image)
+        left, top = xy
+        old = self.pixels[top:top + new.shape[0], left:left + new.shape[1]].astype('uint32')
+        new = new.astype('uint32')
+        mixed = 0
+        for mask in (0xF800, 0x07E0, 0x001F):  # per channel, so no channel overflows into the next
+            mixed = mixed | ((((old & mask) * (255 - alpha) + (new & mask) * alpha) // 255) & mask)
+        return self.put(mixed.astype('uint16'), xy)
+
+    def put(self, new, xy):
+        """writes rgb565 pixels at xy, returns the changed rectangles"""
+        left, top = xy
+        region = self.pixels[top:top + new.shape[0], left:left + new.shape[1]]
+        if not self.valid:
+            region[:] = new
+            self.valid = True
+            return [(0, 0, self.width, self.height)]
+        changed = region != new
+        region[:] = new
+        return [(left + box[0], top + box[1], left + box[2], top + box[3]) for box in self.boxes(changed)]
+
+    def boxes(self, changed):
+        """bounding rectangles of changed pixels per band, touching rectangles merged"""
+        boxes = []
+        for y in range(0, changed.shape[0], self.band):
+            mask = changed[y:y + self.band]
+            cols = mask.any(axis=0)
+            if not cols.any():
+                continue
+            rows = mask.any(axis=1)
+            box = (int(cols.argmax()), y + int(rows.argmax()), len(cols) - int(cols[::-1].argmax()), y + len(rows) - int(rows[::-1].argmax()))
+            if boxes and boxes[-1][3] == box[1]:  # touches the box of the band above, merge them
+                last = boxes.pop()
+                box = (min(last[0], box[0]), last[1], max(last[2], box[2]), box[3])
+            boxes.append(box)
+        return boxes
+
+    def window(self, box):
+        """column/row window (CASET/RASET) of box on the rotated panel, inclusive like set_window of the driver"""
+        x0, y0, x1, y1 = box
+        w, h = self.width, self.height
+        k = (self.rotation // 90) % 4
+        if k == 1:
+            return (y0, w - x1, y1 - 1, w - 1 - x0)
+        if k == 2:
+            return (w - x1, h - y1, w - 1 - x0, h - 1 - y0)
+        if k == 3:
+            return (h - y1, x0, h - 1 - y0, x1 - 1)
+        return (x0, y0, x1 - 1, y1 - 1)
+
+    def data(self, box=None):
+        """bytes of box rotated like the driver rotates images, ready for data() of the display"""
+        if box is None:
+            box = (0, 0, self.width, self.height)
+        x0, y0, x1, y1 = box
+        return numpy.rot90(self.pixels[y0:y1, x0:x1], (self.rotation // 90) % 4).tobytes()
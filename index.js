@@ -116,17 +116,20 @@ pirateaudio.prototype.setUIConfig = function(data) {
 	//Perform your tasks here
 	//Debug
 	//self.logger.info('Wert: ' + data['sleeptimer']);
+	// buttons are registered at start, all other values are reread on reload (SIGHUP) without a restart
+	var action = self.config.get('gpio_ybutton') != parseInt(data['gpio_ybutton'].value) ? 'restart' : 'reload';
 	self.config.set('listmax', parseInt(data['listmax'].value));//works on fieldtype select
 	self.config.set('gpio_ybutton', parseInt(data['gpio_ybutton'].value));//works on fieldtype select
 	self.config.set('sleeptimer', parseInt(data['sleeptimer']));//works on fieldtype input
-	exec("/usr/bin/sudo /bin/systemctl restart pirateaudio.service", {
+	self.config.save();// written before display.py rereads it
+	exec("/usr/bin/sudo /bin/systemctl " + action + " pirateaudio.service", {
 		uid: 1000,
 		gid: 1000
 	  }, function (error, stdout, stderr) {
 		if (error) {
-		  self.logger.info('Pirate audio service failed to re-start. Check your configuration ' + error);
+		  self.logger.info('Pirate audio service failed to ' + action + '. Check your configuration ' + error);
 		} else {
-		  self.commandRouter.pushConsoleMessage('Pirate audio service re-started');
+		  self.commandRouter.pushConsoleMessage('Pirate audio service ' + action + 'ed');
 	
 		  defer.resolve();
 		}
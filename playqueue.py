@@ -0,0 +1,35 @@
+"""Play queue of volumio as compact records, updated from pushQueue by diffing.
+
+Every entry gets a fingerprint of its volumio fields. An identical queue is
+found by comparing the fingerprint arrays, otherwise only the entries between
+the unchanged start and end of the queue are parsed again, the others are
+reused.
+"""
+
+from array import array
+
+
+def fingerprints(items):
+    """hash of the volumio fields per queue entry"""
+    return array('q', [hash((item.get('uri'), item.get('name'), item.get('artist'), item.get('albumart'))) for item in items])
+
+
+def record(item):
+    """compact (name, artist, albumart url) of a queue entry"""
+    return (item.get('name') or '', item.get('artist') or '', (item.get('albumart') or '').encode('ascii', 'ignore').decode('utf-8'))
+
+
+def merge(tracks, old, new, items):
+    """records of items, reusing tracks (fingerprints old) where new matches at the start and the end,
+    returns (records, reused, parsed)"""
+    if new == old:  # nothing changed, e.g. pushQueue after every track change
+        return tracks, len(new), 0
+    same = min(len(old), len(new))
+    prefix = 0
+    while prefix < same and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < same - prefix and old[len(old) - 1 - suffix] == new[len(new) - 1 - suffix]:
+        suffix += 1
+    changed = [record(item) for item in items[prefix:len(items) - suffix]]
+    return tracks[:prefix] + changed + tracks[len(tracks) - suffix:], prefix + suffix, len(changed)
@@ -1,11 +1,15 @@
-import pygame
-from pygame.locals import *
+import os
+from collections import deque
+from threading import Thread, Lock
+from queue import Queue
+from time import monotonic, sleep
+import numpy
 from PIL import Image
 
-# Create ST7789 LCD Display class.
-class ST7789:
+
+class Panel:
+    """what the ST7789 driver does with windows and rgb565 data, the frame is kept as rgb array"""
     def __init__(self, height, width, rotation, port, cs, dc, backlight, spi_speed_hz, offset_left, offset_top):
-        self.screen = pygame.display.set_mode((width, height))
         self.height = height
         self.width = width
         self.rotation = rotation
@@ -16,29 +20,219 @@ class ST7789:
         self.spi_speed_hz = spi_speed_hz
         self.offset_left = offset_left
         self.offset_top = offset_top
+        self.window = (0, 0, width - 1, height - 1)
+        self.rgb = numpy.zeros((height, width, 3), dtype='uint8')  # the right way up
+        self.backlight_on = True
+        # SPI traffic a real display would get, to measure partial updates
+        self.bytes_sent = 0
+        self.frames = 0
+        self.frame_bytes = 0  # of the frame in progress
+        self.frame_pixels = 0
+
+    def set_backlight(self, value):
+        self.backlight_on = bool(value)
 
+    def set_window(self, x0=0, y0=0, x1=None, y1=None):
+        """same as the column/row window of the ST7789 driver, in display coordinates"""
+        if x1 is None:
+            x1 = self.width - 1
+        if y1 is None:
+            y1 = self.height - 1
+        self.window = (x0, y0, x1, y1)
 
+    def image_to_data(self, image, rotation=0):
+        """same rgb565 conversion as the ST7789 driver"""
+        pb = numpy.rot90(numpy.array(image.convert('RGB')), rotation // 90).astype('uint16')
+        color = ((pb[:, :, 0] & 0xF8) << 8) | ((pb[:, :, 1] & 0xFC) << 3) | (pb[:, :, 2] >> 3)
+        return numpy.dstack(((color >> 8) & 0xFF, color & 0xFF)).flatten().tolist()
+
+    def data(self, data):
+        """decodes rgb565 data of the current window and puts it into the frame the right way up"""
+        self.bytes_sent += len(data)
+        self.frame_bytes += len(data)
+        x0, y0, x1, y1 = self.window
+        # bytes of the framebuffer or the byte list of image_to_data
+        color = numpy.frombuffer(bytes(data), dtype='>u2').reshape((y1 - y0 + 1, x1 - x0 + 1))
+        rgb = numpy.dstack(((color >> 8) & 0xF8, (color >> 3) & 0xFC, (color << 3) & 0xF8)).astype('uint8')
+        k = (self.rotation // 90) % 4
+        rgb = numpy.rot90(rgb, -k)
+        # top left corner of the window in image coordinates
+        if k == 1:
+            left, top = self.width - 1 - y1, x0
+        elif k == 2:
+            left, top = self.width - 1 - x1, self.height - 1 - y1
+        elif k == 3:
+            left, top = y0, self.height - 1 - x1
+        else:
+            left, top = x0, y0
+        region = self.rgb[top:top + rgb.shape[0], left:left + rgb.shape[1]]
+        self.frame_pixels += int((region != rgb).any(axis=2).sum())
+        region[:] = rgb
+        return left, top, rgb
 
     def display(self, image):
+        """full frame like the driver, converted here"""
+        self.set_window()
+        self.data(self.image_to_data(image, self.rotation))
+        self.end_frame()
+
+    def end_frame(self, cause=None):
+        """all windows of a frame are sent, cause is the id of the event the frame is for (tracing)"""
+        self.frames += 1
+        self.frame_bytes, self.frame_pixels = 0, 0
+
+    def image(self):
+        """current frame as PIL image"""
+        return Image.fromarray(self.rgb, 'RGB')
+
+
+class ST7789(Panel):
+    """simulator in a pygame window"""
+    def __init__(self, *args, **kwargs):
+        Panel.__init__(self, *args, **kwargs)
+        import pygame
+        self.pygame = pygame
+        self.screen = pygame.display.set_mode((self.width, self.height))
+
+    def data(self, data):
+        left, top, rgb = Panel.data(self, data)
+        self.screen.blit(self.pygame.surfarray.make_surface(rgb.swapaxes(0, 1)), (left, top))
+
+    def set_backlight(self, value):
+        Panel.set_backlight(self, value)
+        if not value:
+            self.screen.fill(0)
+            self.pygame.display.update()
+
+    def end_frame(self, cause=None):
+        Panel.end_frame(self, cause)
+        self.pygame.display.update()
+
+
+class Headless(Panel):
+    """simulator without window: frames stay in memory, optional as png files, with timestamp, bytes and changed pixels per frame
+
+    PIRATEAUDIO_DUMP=<directory> saves every frame as png, PIRATEAUDIO_KEEP=<n> frames are kept in memory (default 100),
+    PIRATEAUDIO_LOG=<n> log entries are kept (default 10000)
+    """
+    def __init__(self, *args, **kwargs):
+        Panel.__init__(self, *args, **kwargs)
+        self.dump = os.environ.get('PIRATEAUDIO_DUMP')
+        if self.dump:
+            os.makedirs(self.dump, exist_ok=True)
+        self.images = deque(maxlen=int(os.environ.get('PIRATEAUDIO_KEEP', 100)))
+        # per frame {"t": monotonic seconds, "bytes": ..., "pixels": changed pixels, "cause": event id if tracing}, the last PIRATEAUDIO_LOG (default 10000)
+        self.log = deque(maxlen=int(os.environ.get('PIRATEAUDIO_LOG', 10000)))
+        self.listeners = []  # called with the log entry of every frame, e.g. for latency measurements
+
+    def end_frame(self, cause=None):
+        entry = {"t": monotonic(), "bytes": self.frame_bytes, "pixels": self.frame_pixels, "cause": cause}
+        self.log.append(entry)
+        image = self.image()
+        self.images.append(image)
+        if self.dump:
+            image.save(os.path.join(self.dump, 'frame_%06d.png' % self.frames))
+        Panel.end_frame(self, cause)
+        for listener in self.listeners:
+            listener(entry)
+
+
+class GPIOSimulator:
+    """stand-in for RPi.GPIO: buttons are pulled up, pressed pulls them low,
+    edge callbacks run one after another on a callback thread like RPi.GPIO does"""
+    BCM = 11
+    IN = 1
+    PUD_UP = 22
+    FALLING = 32
+    RISING = 31
+    BOTH = 33
+
+    def __init__(self):
+        self.levels = {}  # channel -> 1 released (pull up), 0 pressed
+        self.detects = {}  # channel -> (edge, callback, bouncetime in seconds)
+        self.last = {}  # channel -> monotonic time of the last callback, for bouncetime
+        self.lock = Lock()
+        self.events = Queue()
+        self.thread = None
+
+    def setmode(self, mode):
+        pass
+
+    def setup(self, channel, direction, pull_up_down=None):
+        self.levels[channel] = 1
+
+    def input(self, channel):
+        return self.levels.get(channel, 1)
+
+    def add_event_detect(self, channel, edge, callback=None, bouncetime=0):
+        self.detects[channel] = (edge, callback, bouncetime / 1000.0)
+        if self.thread is None:
+            self.thread = Thread(target=self.dispatch)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def cleanup(self, channels=None):
+        for channel in (channels or list(self.levels)):
+            self.levels.pop(channel, None)
+            self.detects.pop(channel, None)
+
+    def dispatch(self):
+        """callback thread"""
+        while True:
+            callback, channel = self.events.get()
+            callback(channel)
+
+    def set_level(self, channel, level):
+        """changes the level of channel and queues the callback if the edge is detected"""
+        with self.lock:
+            if self.levels.get(channel, 1) == level:
+                return
+            self.levels[channel] = level
+            if channel not in self.detects:
+                return
+            edge, callback, bouncetime = self.detects[channel]
+            if edge != self.BOTH and edge != (self.FALLING if level == 0 else self.RISING):
+                return
+            now = monotonic()
+            if now - self.last.get(channel, -bouncetime) < bouncetime:
+                return
+            self.last[channel] = now
+        self.events.put((callback, channel))
+
+    def press(self, channel):
+        self.set_level(channel, 0)
+
+    def release(self, channel):
+        self.set_level(channel, 1)
+
+    def play(self, timeline):
+        """plays a list of (seconds from now, channel, seconds held) in a thread, returns the thread"""
+        actions = []
+        for at, channel, hold in timeline:
+            actions.append((at, 0, channel))
+            actions.append((at + hold, 1, channel))
+        actions.sort()
 
-        mode = image.mode
-        size = image.size
-        data = image.tobytes()
-        py_image = pygame.image.fromstring(data, size, mode)
+        def run():
+            start = monotonic()
+            for at, level, channel in actions:
+                delay = start + at - monotonic()
+                if delay > 0:
+                    sleep(delay)
+                self.set_level(channel, level)
+        thread = Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        return thread
 
-        backgroud = py_image.get_rect()
-        backgroud.center = self.width//2, self.height//2
 
-        self.screen.fill(0xFFFFFF)
-        self.screen.blit(py_image, backgroud)
+GPIO = GPIOSimulator()
 
-        # Update the display
-        pygame.display.update()
 
 def main():
+    import pygame
     # Set up Pygame window
     pygame.init()
-    window = pygame.display.set_mode((240, 240))
 
     # Create ST7789 LCD Display object
     DISP = ST7789(
@@ -76,4 +270,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
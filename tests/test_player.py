@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+pytest.importorskip('PIL')
+pytest.importorskip('numpy')
+os.environ.setdefault('PIRATEAUDIO_DISPLAY', 'headless')  # simulator without window
+
+from PIL import Image, ImageDraw
+
+import display
+
+
+def paint(paint_bar, volume, seek):
+    """paints a bar on an empty frame with volume and seek in seconds"""
+    display.VOLUMIO_DICT.update({'VOLUME': volume, 'SEEK': seek * 1000, 'DURATION': 300, 'TIMEBAR': True})
+    image = Image.new('RGB', (240, 240))
+    paint_bar(ImageDraw.Draw(image, 'RGBA'), 0, 0)
+    return image
+
+
+def test_volume_zero():
+    image = paint(display.paint_volume, 0, 0)
+    assert image.getpixel((6, 188)) == image.getpixel((100, 188))  # background only
+
+
+def test_volume_full():
+    image = paint(display.paint_volume, 100, 0)
+    assert image.getpixel((6, 188)) != paint(display.paint_volume, 0, 0).getpixel((6, 188))
+
+
+def test_seek_zero():
+    image = paint(display.paint_time, 50, 0)
+    assert image.getpixel((6, 234)) == image.getpixel((100, 234))
+
+
+def test_seek_half():
+    image = paint(display.paint_time, 50, 150)
+    assert image.getpixel((6, 234)) != paint(display.paint_time, 50, 0).getpixel((6, 234))
@@ -0,0 +1,87 @@
+from array import array
+
+import playqueue
+
+
+def queue(names):
+    """pushQueue payload like volumio sends it"""
+    return [{"uri": 'mnt/' + name, "name": name, "artist": 'Artist ' + name, "albumart": '/albumart?path=' + name} for name in names]
+
+
+class Queue:
+    """queue model as display.py holds it"""
+    def __init__(self):
+        self.tracks, self.fingerprints = [], array('q')
+
+    def push(self, names):
+        items = queue(names)
+        new = playqueue.fingerprints(items)
+        self.tracks, reused, parsed = playqueue.merge(self.tracks, self.fingerprints, new, items)
+        self.fingerprints = new
+        # aligned with the fingerprints and equal to parsing everything again
+        assert len(self.tracks) == len(self.fingerprints)
+        assert self.tracks == [playqueue.record(item) for item in items]
+        return reused, parsed
+
+
+def test_first_push_parses_everything():
+    model = Queue()
+    assert model.push(list('abcde')) == (0, 5)
+
+
+def test_identical_push_parses_nothing():
+    model = Queue()
+    model.push(list('abcde'))
+    tracks = model.tracks
+    assert model.push(list('abcde')) == (5, 0)
+    assert model.tracks is tracks
+
+
+def test_append():
+    model = Queue()
+    model.push(list('abc'))
+    first = model.tracks[0]
+    assert model.push(list('abcde')) == (3, 2)
+    assert model.tracks[0] is first
+
+
+def test_removal_in_the_middle():
+    model = Queue()
+    model.push(list('abcde'))
+    last = model.tracks[-1]
+    assert model.push(list('abde')) == (4, 0)
+    assert model.tracks[-1] is last
+
+
+def test_insert_in_the_middle():
+    model = Queue()
+    model.push(list('abcde'))
+    assert model.push(list('abXcde')) == (5, 1)
+
+
+def test_reorder():
+    model = Queue()
+    model.push(list('abcde'))
+    assert model.push(list('adcbe')) == (2, 3)
+    assert model.push(list('edcba')) == (0, 5)  # only the start and the end are reused
+
+
+def test_repeated_entries():
+    model = Queue()
+    model.push(list('aaa'))
+    assert model.push(list('aaaa')) == (3, 1)
+    assert model.push(list('aa')) == (2, 0)
+
+
+def test_empty_queue():
+    model = Queue()
+    assert model.push([]) == (0, 0)
+    model.push(list('abc'))
+    assert model.push([]) == (0, 0)
+    assert model.tracks == []
+    assert model.push(list('ab')) == (0, 2)
+
+
+def test_record_is_compact_and_ascii_art():
+    item = {"name": 'Title', "artist": None, "albumart": '/albumart?path=Café', "uri": 'x', "service": 'mpd'}
+    assert playqueue.record(item) == ('Title', '', '/albumart?path=Caf')